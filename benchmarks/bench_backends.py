@@ -0,0 +1,125 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import Measure, report
+from mock_servers import MockServer
+from translators import Translator
+
+WORDS = 'robot joint torque controller task space null prioritization kinematic command error position'.split()
+
+
+def sentences(count, seed=0):
+    # unique sentences, so that neither the cache nor single-flight hides a request
+    return [f'{" ".join(WORDS[(i * 7 + j + seed) % len(WORDS)] for j in range(12))} #{seed}-{i}.'
+            for i in range(count)]
+
+
+def make_translator(api, server, engine, rate=1e6):
+    # by default the client side limit is lifted to measure the client and the server alone
+    network = {'endpoints': {api: server.url}, 'rate_limit': {api: {'rate': rate, 'burst': max(1, int(rate))}}}
+    if engine == 'async':
+        from translators.aio import AsyncTranslator
+        translator = AsyncTranslator(api, network=network)
+    else:
+        translator = Translator(api, network=network)
+    translator.set_api_keys(server.appid, server.secret)
+    return translator
+
+
+class Runner:
+    def __init__(self, engine):
+        self.event_loop = None
+        if engine == 'async':
+            from translators.aio import EventLoopThread
+            self.event_loop = EventLoopThread()
+
+    def __call__(self, result):
+        return self.event_loop.submit(result).result() if self.event_loop is not None else result
+
+    def stop(self):
+        if self.event_loop is not None:
+            self.event_loop.stop()
+
+
+def timed(run, translator, string):
+    start = time.perf_counter()
+    status, _ = run(translator.translate(string))
+    return time.perf_counter() - start, status
+
+
+def bench_latency(api, server, engine, run, count):
+    translator = make_translator(api, server, engine)
+    latencies, failed = [], 0
+    with Measure() as measure:
+        for sentence in sentences(count):
+            latency, status = timed(run, translator, sentence)
+            latencies.append(latency)
+            failed += bool(status)
+    report(f'{api} sequential', latencies, measure)
+    return failed
+
+
+def bench_concurrent(api, server, engine, run, count, clients):
+    translator = make_translator(api, server, engine)
+    with Measure() as measure, ThreadPoolExecutor(clients) as pool:
+        results = list(pool.map(lambda s: timed(run, translator, s), sentences(count, seed=1)))
+    report(f'{api} {clients} clients', [latency for latency, _ in results], measure)
+    return sum(bool(status) for _, status in results)
+
+
+def bench_document(api, server, engine, run, count):
+    # one long input through chunking and parallel chunk requests
+    translator = make_translator(api, server, engine)
+    requests = server.counts['requests']
+    with Measure() as measure:
+        status, translations = run(translator.translate_sentences(sentences(count, seed=2)))
+    requests = server.counts['requests'] - requests
+    print(f'{api + " document":<28} {count} sentences in {measure.wall * 1e3:8.1f} ms  {requests} requests  '
+          f'{count / measure.wall:9.1f} sentences/s  cpu {measure.cpu / count * 1e3:7.3f} ms each')
+    return bool(status) or not all(translations)
+
+
+def bench_throttled(api, server, engine, run, count):
+    # the client sends twice as fast as the server accepts, rejected requests back off
+    translator = make_translator(api, server, engine, rate=2 * server.limit.rate)
+    latencies, failed = [], 0
+    with Measure() as measure:
+        for sentence in sentences(count, seed=3):
+            latency, status = timed(run, translator, sentence)
+            latencies.append(latency)
+            failed += bool(status)
+    report(f'{api} throttled', latencies, measure)
+    print(f'{"":<28} {translator.scheduler.throttled} retries after throttling')
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='end-to-end translator benchmark against the local mock servers')
+    parser.add_argument('--api', nargs='+', default=['baidu', 'youdao'], choices=['baidu', 'youdao'])
+    parser.add_argument('--engine', default='thread', choices=['thread', 'async'])
+    parser.add_argument('--latency', type=float, default=0.02, help='server latency in seconds')
+    parser.add_argument('-n', '--count', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=8)
+    args = parser.parse_args()
+
+    run = Runner(args.engine)
+    failed = 0
+    try:
+        with MockServer(latency=args.latency, jitter=args.latency / 2) as server:
+            for api in args.api:
+                failed += bench_latency(api, server, args.engine, run, args.count)
+                failed += bench_concurrent(api, server, args.engine, run, args.count, args.clients)
+                failed += bench_document(api, server, args.engine, run, args.count)
+        with MockServer(latency=args.latency, jitter=0., rate=5., burst=5) as server:
+            for api in args.api:
+                failed += bench_throttled(api, server, args.engine, run, 20)
+    finally:
+        run.stop()
+    if failed:
+        print(f'{failed} requests failed')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
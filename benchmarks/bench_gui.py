@@ -0,0 +1,98 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+
+from common import BENCH_DIR, Measure, report
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+# gui resolves the config directory on import; a throwaway home keeps the user's config,
+# memory and dictionary out of the measurements and untouched
+HOME = tempfile.TemporaryDirectory()
+os.environ['HOME'] = os.environ['USERPROFILE'] = HOME.name
+
+from PyQt5.QtWidgets import QApplication
+
+from gui import TransGui, join_translations
+from translators import Alignment
+
+
+def make_document(lines, chunk):
+    sources = [f'Sentence {i} about the kinematic whole-body controller and its null-space tasks.'
+               for i in range(lines)]
+    translations = [f'关于运动学全身控制器及其零空间任务的第 {i} 句。' for i in range(lines)]
+    chunks = [range(i, min(i + chunk, lines)) for i in range(0, lines, chunk)]
+    return sources, translations, chunks
+
+
+def bench_full(window, app, sources, translations, rounds):
+    latencies = []
+    with Measure() as measure:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            window.show_translation('', join_translations(translations), Alignment(sources, translations))
+            app.processEvents()
+            latencies.append(time.perf_counter() - start)
+    report('full setPlainText', latencies, measure)
+
+
+def bench_streaming(window, app, sources, translations, chunks, rounds):
+    # the first report carries every line, then one report per chunk reply
+    first, updates = [], []
+    with Measure() as measure:
+        for _ in range(rounds):
+            window.generation += 1
+            job = SimpleNamespace(generation=window.generation, string='\n'.join(sources))
+            window.on_partial(job, dict.fromkeys(range(len(sources)), ''))
+            for n, chunk in enumerate(chunks):
+                start = time.perf_counter()
+                window.on_partial(job, {i: translations[i] for i in chunk})
+                app.processEvents()
+                (first if n == 0 else updates).append(time.perf_counter() - start)
+    report('first chunk rendered', first, measure, rounds)
+    if updates:
+        report('chunk block update', updates, measure, len(updates))
+
+
+def bench_correspond(window, sources, translations, rounds):
+    window.show_translation('', join_translations(translations), Alignment(sources, translations))
+    size = window.texted_output.document().characterCount() - 1
+    latencies = []
+    with Measure() as measure:
+        for _ in range(rounds):
+            cursor = window.texted_output.textCursor()
+            cursor.setPosition(random.randrange(size))
+            start = time.perf_counter()
+            window.texted_output.setTextCursor(cursor)
+            latencies.append(time.perf_counter() - start)
+    report('click to highlight', latencies, measure)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark of the output pane update path')
+    parser.add_argument('--lines', type=int, nargs='+', default=[50, 500, 2000])
+    parser.add_argument('--chunk', type=int, default=50, help='lines per chunk reply')
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(BENCH_DIR))
+    app = QApplication([])
+    window = TransGui(app)
+    # nothing is sent to a backend, the panes are driven directly
+    window.capture_clipboard = False
+    window.delay.disable()
+    for lines in args.lines:
+        print(f'--- {lines} lines, p50/p99 over {args.rounds} rounds')
+        sources, translations, chunks = make_document(lines, args.chunk)
+        window.texted_input.setPlainText('\n'.join(sources))
+        bench_full(window, app, sources, translations, args.rounds)
+        bench_streaming(window, app, sources, translations, chunks, args.rounds)
+        bench_correspond(window, sources, translations, args.rounds * 20)
+    window.close()
+    HOME.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import json
+import os
+import sys
+import time
+
+from common import BENCH_DIR, Measure, report
+from translators.text import sentence_split
+
+CORPUS = os.path.join(BENCH_DIR, 'sentence_split_corpus.json')
+PARAGRAPH = (
+    'We first formulate a kinematic whole-\nbody controller to obtain joint commands given operational '
+    'space commands. The basic idea is to compute incremental joint positions based on ‘operational '
+    'space’ position errors: This is done using null-space task prioritization, as follows; '
+    '• the first task. • the second task.\n'
+)
+
+
+def check_corpus():
+    with open(CORPUS, encoding='utf-8') as f:
+        cases = json.load(f)
+    failed = [case for case in cases if sentence_split(case['input']) != case['output']]
+    for case in failed:
+        print(f"mismatch for {case['input']!r}:\n  expected {case['output']}\n  got      {sentence_split(case['input'])}")
+    print(f'corpus: {len(cases) - len(failed)}/{len(cases)} cases match')
+    return not failed
+
+
+def best_of(func, arg, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def check_scaling(max_factor=3.):
+    per_kb = []
+    size = 1 << 10
+    while size <= 1 << 20:
+        text = (PARAGRAPH * (size // len(PARAGRAPH) + 1))[:size]
+        elapsed = best_of(sentence_split, text)
+        per_kb.append(elapsed / size * 1024)
+        print(f'{size >> 10:>6} KB  {elapsed * 1e3:9.3f} ms  {per_kb[-1] * 1e6:7.2f} us/KB')
+        size <<= 2
+    # linear scaling keeps the cost per KB roughly flat from 1 KB to 1 MB
+    factor = per_kb[-1] / min(per_kb)
+    print(f'cost per KB grows {factor:.2f}x (limit {max_factor}x)')
+    return factor <= max_factor
+
+
+def check_latency(rounds=2000):
+    # one paragraph per call, the size of a typical clipboard capture
+    latencies = []
+    with Measure() as measure:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            sentence_split(PARAGRAPH)
+            latencies.append(time.perf_counter() - start)
+    report('sentence_split (paragraph)', latencies, measure)
+
+
+if __name__ == '__main__':
+    ok = check_corpus()
+    check_latency()
+    ok = check_scaling() and ok
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+START = time.perf_counter()
+
+from common import BENCH_DIR
+
+REPO_DIR = os.path.dirname(BENCH_DIR)
+# none of these may be imported before the window is shown
+HEAVY_MODULES = ('googletrans', 'httpcore', 'httpx', 'requests', 'easyocr')
+
+
+def child_import():
+    import gui  # noqa: F401
+    elapsed = time.perf_counter() - START
+    print(json.dumps({'import': elapsed, 'heavy': [m for m in HEAVY_MODULES if m in sys.modules]}))
+
+
+def child_paint(timeout):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtCore import QObject, QEvent, QTimer
+    from PyQt5.QtWidgets import QApplication
+    from gui import TransGui
+
+    result = {}
+
+    class FirstPaint(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and 'paint' not in result:
+                result['paint'] = time.perf_counter() - START
+                result['heavy'] = [m for m in HEAVY_MODULES if m in sys.modules]
+            return False
+
+    def poll():
+        # warm-up runs in the background, the backend exists once it is done
+        if window.translator._trans is not None and 'paint' in result:
+            result['ready'] = time.perf_counter() - START
+            app.quit()
+
+    app = QApplication([])
+    first_paint = FirstPaint()
+    app.installEventFilter(first_paint)
+    window = TransGui(app)
+    timer = QTimer()
+    timer.timeout.connect(poll)
+    timer.start(5)
+    QTimer.singleShot(int(timeout * 1000), app.quit)
+    app.exec_()
+    window.close()
+    print(json.dumps(result))
+
+
+def run_child(mode, home, runs, timeout):
+    env = dict(os.environ, HOME=home, USERPROFILE=home)
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, __file__, '--child', mode, '--timeout', str(timeout)],
+                             cwd=REPO_DIR, env=env, capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    return results
+
+
+def write_config(home, engine):
+    # the packaged defaults with the engine under test, as a first start would copy them
+    with open(os.path.join(REPO_DIR, 'config.yaml'), encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    config['api']['engine'] = engine
+    config_dir = os.path.join(home, '.config', 'trans_gui')
+    os.makedirs(config_dir)
+    with open(os.path.join(config_dir, 'config.yaml'), 'w', encoding='utf-8') as f:
+        yaml.dump(config, f)
+
+
+def check(name, values, budget):
+    best = min(values)
+    ok = best <= budget
+    print(f'{name:<22} best {best * 1e3:8.1f} ms  worst {max(values) * 1e3:8.1f} ms  budget {budget * 1e3:6.0f} ms  '
+          f'{"ok" if ok else "OVER BUDGET"}')
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='cold start budget: import time and time to first paint')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--import-budget', type=float, default=0.5, help='seconds to import gui.py')
+    parser.add_argument('--paint-budget', type=float, default=1.5, help='seconds from start to the first paint')
+    parser.add_argument('--timeout', type=float, default=30.)
+    parser.add_argument('--engine', choices=['thread', 'async'], nargs='+', default=['thread', 'async'])
+    parser.add_argument('--child', choices=['import', 'paint'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child == 'import':
+        return child_import()
+    if args.child == 'paint':
+        return child_paint(args.timeout)
+
+    ok = True
+    for engine in args.engine:
+        # a fresh config directory, as on a first start
+        with tempfile.TemporaryDirectory() as home:
+            write_config(home, engine)
+            imports = run_child('import', home, args.runs, args.timeout)
+            paints = run_child('paint', home, args.runs, args.timeout)
+        print(f'engine: {engine}')
+        ok = check('import gui', [r['import'] for r in imports], args.import_budget) and ok
+        ok = check('first paint', [r['paint'] for r in paints if 'paint' in r] or [float('inf')],
+                   args.paint_budget) and ok
+        ready = [r['ready'] for r in paints if 'ready' in r]
+        if ready:
+            print(f'{"backend ready":<22} best {min(ready) * 1e3:8.1f} ms  (warmed up after the first paint)')
+        heavy = sorted({m for r in imports + paints for m in r.get('heavy', [])})
+        if heavy:
+            print(f'imported before the first paint: {", ".join(heavy)}')
+            ok = False
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
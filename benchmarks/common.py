@@ -0,0 +1,27 @@
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+class Measure:
+    # wall and CPU time of a block, CPU time covers all threads of the process
+    def __enter__(self):
+        self.wall, self.cpu = time.perf_counter(), time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall, self.cpu = time.perf_counter() - self.wall, time.process_time() - self.cpu
+
+
+def report(name, latencies, measure, count=None):
+    count = count or len(latencies)
+    print(f'{name:<28} p50 {percentile(latencies, 50) * 1e3:8.2f} ms  p99 {percentile(latencies, 99) * 1e3:8.2f} ms  '
+          f'{count / measure.wall:9.1f} /s  cpu {measure.cpu / count * 1e3:7.3f} ms each')
@@ -0,0 +1,204 @@
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+BAIDU_PATH = '/api/trans/vip/translate'
+YOUDAO_PATH = '/api'
+BAIDU_ERRORS = {
+    '52001': 'TIMEOUT',
+    '52003': 'UNAUTHORIZED USER',
+    '54000': 'PARAM_FROM_TO_OR_Q_EMPTY',
+    '54001': 'Invalid Sign',
+    '54003': 'Invalid Access Limit',
+}
+
+
+def fake_translation(line):
+    return f'译：{line}' if line else ''
+
+
+def youdao_truncate(q):
+    return q if len(q) <= 20 else q[:10] + str(len(q)) + q[-10:]
+
+
+class RateWindow:
+    # requests beyond `rate` per second (with `burst` headroom) are rejected, not queued
+    def __init__(self, rate=None, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        if self.rate is None:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class MockServer:
+    # speaks the Baidu and Youdao translation protocols on one port
+    def __init__(self, host='127.0.0.1', port=0, latency=0.02, jitter=0.01, error_rate=0.,
+                 rate=None, burst=1, appid='mock-appid', secret='mock-secret'):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.limit = RateWindow(rate, burst)
+        self.appid = appid
+        self.secret = secret
+        self.counts = {'requests': 0, 'throttled': 0, 'errors': 0}
+        self.counts_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self.make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def count(self, key):
+        with self.counts_lock:
+            self.counts[key] += 1
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='mock-server', daemon=True)
+        self.thread.start()
+        return self.url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def simulate(self):
+        # returns False when the request is rejected by the rate limit
+        self.count('requests')
+        time.sleep(max(0., self.latency + random.uniform(-self.jitter, self.jitter)))
+        if not self.limit.allow():
+            self.count('throttled')
+            return False
+        return True
+
+    def failed(self):
+        if self.error_rate and random.random() < self.error_rate:
+            self.count('errors')
+            return True
+        return False
+
+    def baidu(self, params):
+        if not all(params.get(k) for k in ('q', 'from', 'to', 'appid', 'salt', 'sign')):
+            return self.baidu_error('54000')
+        if params['appid'] != self.appid:
+            return self.baidu_error('52003')
+        sign = hashlib.md5((params['appid'] + params['q'] + params['salt'] + self.secret).encode()).hexdigest()
+        if params['sign'] != sign:
+            return self.baidu_error('54001')
+        if not self.simulate():
+            return self.baidu_error('54003')
+        if self.failed():
+            return self.baidu_error('52001')
+        lines = params['q'].split('\n')
+        return {'from': params['from'], 'to': params['to'],
+                'trans_result': [{'src': line, 'dst': fake_translation(line)} for line in lines]}
+
+    @staticmethod
+    def baidu_error(code):
+        return {'error_code': code, 'error_msg': BAIDU_ERRORS[code]}
+
+    def youdao(self, params):
+        if not all(params.get(k) for k in ('q', 'from', 'to', 'appKey', 'salt', 'sign', 'curtime')):
+            return {'errorCode': '101'}
+        if params['appKey'] != self.appid:
+            return {'errorCode': '108'}
+        sign_str = params['appKey'] + youdao_truncate(params['q']) + params['salt'] + params['curtime'] + self.secret
+        if params['sign'] != hashlib.sha256(sign_str.encode()).hexdigest():
+            return {'errorCode': '202'}
+        if not self.simulate():
+            return {'errorCode': '411'}
+        if self.failed():
+            return {'errorCode': '500'}
+        translation = '\n'.join(fake_translation(line) for line in params['q'].split('\n'))
+        return {'errorCode': '0', 'query': params['q'], 'translation': [translation],
+                'l': f"{params['from']}2{params['to']}"}
+
+    def make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                self.dispatch({})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode('utf-8')
+                self.dispatch(parse_qs(body))
+
+            def dispatch(self, form):
+                url = urlsplit(self.path)
+                params = {k: v[0] for k, v in {**parse_qs(url.query), **form}.items()}
+                if url.path == BAIDU_PATH:
+                    self.reply(server.baidu(params))
+                elif url.path == YOUDAO_PATH:
+                    self.reply(server.youdao(params))
+                else:
+                    self.send_error(404)
+
+            def reply(self, data):
+                content = json.dumps(data, ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='local stand-in for the Baidu and Youdao translation APIs')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per request')
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--error-rate', type=float, default=0.)
+    parser.add_argument('--rate', type=float, help='requests per second before throttling')
+    parser.add_argument('--burst', type=int, default=1)
+    parser.add_argument('--appid', default='mock-appid')
+    parser.add_argument('--secret', default='mock-secret')
+    args = parser.parse_args()
+    server = MockServer(args.host, args.port, args.latency, args.jitter, args.error_rate,
+                        args.rate, args.burst, args.appid, args.secret)
+    print(f'serving Baidu ({server.url}{BAIDU_PATH}) and Youdao ({server.url}{YOUDAO_PATH}), appid/key '
+          f'{args.appid!r}, secret {args.secret!r}')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,25 @@
+import argparse
+import hashlib
+import json
 import os
 import shutil
 import sys
+import threading
 import time
+import traceback
+from collections import OrderedDict
+from itertools import accumulate
 
 import yaml
-from PyQt5.QtCore import QTimer, QThread, QObject, pyqtSignal, QMutex, Qt, QSize
-from PyQt5.QtGui import QIcon, QFont, QColor, QTextCursor, QPalette
+from PyQt5.QtCore import QTimer, QObject, pyqtSignal, Qt, QSize, QRunnable, QThreadPool, QRect
+from PyQt5.QtGui import (QIcon, QFont, QColor, QTextCursor, QPalette, QClipboard, QCursor, QImage, QPainter)
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
 from PyQt5.QtWidgets import (QApplication, QTextEdit, QPushButton,
-                             QToolTip, QAction, QMainWindow, QMenu, QDialog, QLineEdit, QLabel)
+                             QToolTip, QAction, QMainWindow, QMenu, QDialog, QLineEdit, QLabel, QWidget)
 
-from translators import Translator
+from translators import Alignment, Translator, TranslationMemory, OfflineDictionary, FuzzyIndex, ipc, sentence_split
+from translators.router import DEFAULT_BACKENDS, FastestTranslator
+from translators.trace import tracer
 
 PKG_DIR = os.path.dirname(os.path.abspath(__file__))
 ICON_DIR = os.path.join(PKG_DIR, 'icon')
@@ -22,58 +32,253 @@ def get_icon_path(name):
 class WaitForReleasing(QObject):
     released = pyqtSignal()
 
-    def __init__(self, delay=0.5):
-        super().__init__()
+    def __init__(self, delay=0.5, parent=None):
+        super().__init__(parent)
         self.delay = delay
-        self.start_time = None
-        self.mutex = QMutex()
         self._enable = True
-
-    def refresh(self):
-        self.mutex.lock()
-        self.start_time = time.time()
-        self.mutex.unlock()
-
-    def main_thread(self):
-        while True:
-            self.mutex.lock()
-            if self.start_time is not None and time.time() - self.start_time > self.delay:
-                self.start_time = None
-                if self._enable:
-                    self.released.emit()
-            self.mutex.unlock()
-            time.sleep(0.01)
+        self.pending_since = None
+        # a single-shot timer restarted on every refresh, nothing runs while idle
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.on_timeout)
+
+    def refresh(self, immediate=False):
+        self.mark_pending()
+        self.timer.start(0 if immediate else int(self.delay * 1000))
+
+    def mark_pending(self):
+        # the debounce span runs from the first refresh of a burst to the release
+        if self.pending_since is None:
+            self.pending_since = time.perf_counter()
+        tracer.count('debounce.refresh')
+
+    def on_timeout(self):
+        if self.pending_since is not None:
+            tracer.add('debounce', self.pending_since, time.perf_counter() - self.pending_since)
+            self.pending_since = None
+        if self._enable:
+            self.released.emit()
 
     def enable(self):
-        self.mutex.lock()
         self._enable = True
-        self.mutex.unlock()
 
     def disable(self):
-        self.mutex.lock()
         self._enable = False
-        self.mutex.unlock()
 
 
-def sentence_split(string: str):
-    modified = string.translate({ord('\n'): ' ', ord('‘'): "'", ord('’'): "'"})
-    modified = modified.replace('- ', '').replace('? ', '')
-    modified = ''.join(filter(lambda s: s.isprintable(), modified))
-    sentences = []
+class AdaptiveWaitForReleasing(WaitForReleasing):
+    def __init__(self, delay=0.3, min_delay=0.1, max_delay=1.5, latency=None, parent=None):
+        super().__init__(delay, parent)
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.latency = latency  # callable returning the backend's median latency in seconds
+        self.last_refresh = None
+        self.typing_interval = None
+
+    def refresh(self, immediate=False):
+        self.mark_pending()
+        if immediate:
+            self.last_refresh = None
+            self.timer.start(0)
+            return
+        now = time.monotonic()
+        if self.last_refresh is not None and (interval := now - self.last_refresh) < self.max_delay:
+            # exponential moving average of the gaps between keystrokes of one burst
+            if self.typing_interval is None:
+                self.typing_interval = interval
+            else:
+                self.typing_interval = 0.7 * self.typing_interval + 0.3 * interval
+        self.last_refresh = now
+        self.timer.start(int(self.current_delay() * 1000))
+
+    def current_delay(self):
+        delay = self.delay
+        if self.typing_interval is not None:
+            # wait past the usual keystroke gap so that a burst fires only once
+            delay = max(delay, 2 * self.typing_interval)
+        if self.latency is not None:
+            # a slow backend makes every wasted request expensive
+            delay += 0.5 * self.latency()
+        return min(max(delay, self.min_delay), self.max_delay)
+
+    def on_timeout(self):
+        self.typing_interval = None
+        super().on_timeout()
+
+
+# generation of jobs that only warm the caches and never update the output
+PREFETCH = -1
+
+
+class TranslateSignals(QObject):
+    finished = pyqtSignal(object, str, str)
+    partial = pyqtSignal(object, object)
+
+
+class TranslateJob(QRunnable):
+    def __init__(self, generation, translator, string, detect_lang=False):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.generation = generation
+        self.translator = translator
+        self.string = string
+        self.detect_lang = detect_lang
+        self.cancelled = False
+        self.alignment = None
+        self.started = time.perf_counter()
+        self.signals = TranslateSignals()
+
+    def start(self, pool: QThreadPool):
+        pool.start(self)
+
+    def report(self, updates):
+        self.signals.partial.emit(self, updates)
+
+    def partial_callback(self):
+        # cache warming jobs have no pane to fill
+        return None if self.generation == PREFETCH else self.report
+
+    def cancel(self, pool: QThreadPool):
+        self.cancelled = True
+        # jobs still waiting in the queue are dropped without running
+        return pool.tryTake(self)
+
+    def run(self):
+        status, translation = '', ''
+        if not self.cancelled:
+            lines = self.string.split('\n')
+            try:
+                status, translations = self.translator.translate_sentences(
+                    lines, self.detect_lang, self.partial_callback(), lambda: self.cancelled
+                )
+            except Exception as error:
+                # an exception escaping QRunnable.run aborts the whole application
+                status = f'error: {error!r}'
+            else:
+                translation = join_translations(translations)
+                self.alignment = Alignment(lines, translations)
+        # always report back so that the owner can release the job
+        self.signals.finished.emit(self, status, translation)
+
+
+class AsyncTranslateJob:
+    def __init__(self, generation, translator, string, event_loop, detect_lang=False):
+        self.generation = generation
+        self.translator = translator
+        self.string = string
+        self.detect_lang = detect_lang
+        self.event_loop = event_loop
+        self.future = None
+        self.alignment = None
+        self.started = time.perf_counter()
+        self.signals = TranslateSignals()
+
+    def start(self, pool: QThreadPool):
+        self.future = self.event_loop.submit(
+            self.translator.translate_sentences(self.string.split('\n'), self.detect_lang, self.partial_callback())
+        )
+        self.future.add_done_callback(self.on_done)
 
-    def _get_first_sentence(_str: str):
-        _str = _str.strip()
-        for idx, char in enumerate(_str):
-            if char in ('.', ':', ';') and (remains := _str[idx + 1:].lstrip()):
-                if remains[0].isupper() or remains[0] == '•':
-                    return _str[:idx + 1], remains
-        else:
-            return _str, ''
+    def report(self, updates):
+        self.signals.partial.emit(self, updates)
 
-    while modified:
-        sentence, modified = _get_first_sentence(modified)
-        sentences.append(sentence)
-    return sentences
+    def partial_callback(self):
+        return None if self.generation == PREFETCH else self.report
+
+    def cancel(self, pool: QThreadPool):
+        # only this job stops waiting; the shielded requests keep running on the event
+        # loop and their results still reach other callers and the cache; the job is
+        # released in on_done
+        self.future.cancel()
+        return False
+
+    def on_done(self, future):
+        status, translation = '', ''
+        if not future.cancelled():
+            try:
+                status, translations = future.result()
+            except Exception as error:
+                # the job still has to report back, or the status bar stays on 'translating'
+                status = f'error: {error!r}'
+            else:
+                translation = join_translations(translations)
+                self.alignment = Alignment(self.string.split('\n'), translations)
+        self.signals.finished.emit(self, status, translation)
+
+
+class BackgroundTask(QRunnable):
+    def __init__(self, func, *args):
+        super().__init__()
+        self.func = func
+        self.args = args
+
+    def run(self):
+        try:
+            self.func(*self.args)
+        except Exception:
+            traceback.print_exc()
+
+
+class InstanceServer(QObject):
+    # later launches and the command line client talk to the running instance,
+    # one json object per line each way
+    def __init__(self, handler, parent=None):
+        super().__init__(parent)
+        self.handler = handler  # called with the message and a reply callable
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.on_connection)
+
+    def listen(self, path):
+        if self.server.listen(path):
+            return True
+        if ipc.is_running():
+            # another launch got there first, its socket must not be taken over
+            return False
+        # a socket left behind by an instance that did not shut down cleanly
+        QLocalServer.removeServer(path)
+        return self.server.listen(path)
+
+    def error_string(self):
+        return self.server.errorString()
+
+    def close(self):
+        self.server.close()
+
+    def on_connection(self):
+        while (socket := self.server.nextPendingConnection()) is not None:
+            socket.readyRead.connect(lambda s=socket: self.on_ready_read(s))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def on_ready_read(self, socket):
+        while socket.canReadLine():
+            try:
+                message = json.loads(bytes(socket.readLine()).decode('utf-8'))
+            except ValueError:
+                self.send(socket, {'status': 'bad request'})
+                continue
+            self.handler(message, lambda response, s=socket: self.send(s, response))
+
+    @staticmethod
+    def send(socket, response):
+        try:
+            if socket.state() == QLocalSocket.ConnectedState:
+                socket.write(ipc.encode(response))
+                socket.flush()
+        except RuntimeError:
+            # the client hung up and the socket has been deleted
+            pass
+
+
+def join_translations(translations):
+    return '\n'.join(translations).rstrip('\n')
+
+
+def text_hashes(text):
+    # hashes of a shown text and each of its lines, to recognise them when copied back
+    hashes = {hash(line.strip()) for line in text.split('\n')}
+    hashes.add(hash(text.strip()))
+    return hashes
 
 
 def get_home_dir():
@@ -87,6 +292,7 @@ def get_home_dir():
 
 class TransConfig:
     USER_CONFIG_PATH = os.path.join(get_home_dir(), '.config', 'trans_gui', 'config.yaml')
+    MEMORY_PATH = os.path.join(os.path.dirname(USER_CONFIG_PATH), 'memory.sqlite3')
 
     def __init__(self, file=None):
         if file is None:
@@ -99,6 +305,14 @@ class TransConfig:
             self.config = yaml.safe_load(f.read())
 
         self.api = self.config['api']['server']
+        self.engine = self.config['api'].get('engine', 'thread')
+        self.memory_cfg = self.config.get('memory', {})
+        self.dictionary_cfg = self.config.get('dictionary', {})
+        self.fuzzy_cfg = self.config.get('fuzzy', {})
+        self.ocr_cfg = self.config.get('ocr', {})
+        self.network_cfg = self.config.get('network', {})
+        self.debounce_cfg = self.config.get('debounce', {})
+        self.clipboard_cfg = self.config.get('clipboard', {})
         self._font_cfg = self.config['font_config']
 
         self._font_family = self._font_cfg['font_family']
@@ -210,19 +424,60 @@ class ApiHelper(QDialog):
 
 
 class TransGui(QMainWindow):
-    def __init__(self, app: QApplication, cfg=TransConfig()):
+    paste_threshold = 20
+
+    def __init__(self, app: QApplication, cfg: TransConfig = None):
         super(TransGui, self).__init__()
         self.app = app
-        self.cfg = cfg
+        self.cfg = cfg if cfg is not None else TransConfig()
 
         self.x, self.y = 0, 0
 
-        self.delay = WaitForReleasing(0.3)
-        self.delay_thread = QThread(self)
+        if self.cfg.debounce_cfg.get('mode', 'adaptive') == 'adaptive':
+            self.delay = AdaptiveWaitForReleasing(
+                self.cfg.debounce_cfg.get('delay', 0.3),
+                self.cfg.debounce_cfg.get('min_delay', 0.1),
+                self.cfg.debounce_cfg.get('max_delay', 1.5),
+                latency=lambda: self.translator.latency.p50,
+                parent=self
+            )
+        else:
+            self.delay = WaitForReleasing(self.cfg.debounce_cfg.get('delay', 0.3), self)
         self._enabled = True
+        self.memory = TranslationMemory(
+            self.cfg.MEMORY_PATH,
+            max_entries=self.cfg.memory_cfg.get('max_entries', 100000),
+            enabled=self.cfg.memory_cfg.get('enabled', True)
+        )
+        self.dictionary = None
+        dictionary_path = os.path.join(os.path.dirname(self.cfg.USER_CONFIG_PATH),
+                                       self.cfg.dictionary_cfg.get('path', 'dictionary.sqlite3'))
+        if self.cfg.dictionary_cfg.get('enabled', False) and os.path.exists(dictionary_path):
+            self.dictionary = OfflineDictionary(dictionary_path, self.cfg.dictionary_cfg.get('max_words', 3))
+        self.fuzzy = None
+        self.background_tasks = []
+        self.instance_server = None
+        if self.cfg.fuzzy_cfg.get('enabled', False):
+            self.fuzzy = FuzzyIndex(self.cfg.fuzzy_cfg.get('max_entries', 50000),
+                                    self.cfg.fuzzy_cfg.get('threshold', 0.9))
+            self.run_in_background(self.load_fuzzy_index)
+        self.event_loop = None
+        if self.cfg.engine == 'async':
+            from translators.aio import EventLoopThread
+            self.event_loop = EventLoopThread()
+        self.translator = None
         self.init_translator(self.cfg.api)
         self.statusBar().showMessage(f'API: {self.translator.api}')
-        self.translate_thread = QThread(self)
+        self.translate_pool = QThreadPool(self)
+        self.translate_pool.setMaxThreadCount(4)
+        self.translate_jobs = set()
+        self.prefetch_job = None
+        self.generation = 0
+        # progressive output of the current job: translation and block count per input line
+        self.partial_job = None
+        self.partial_lines = []
+        self.output_spans = None
+        self.alignment = None
         self.init_trans()
 
         self.texted_input = QTextEdit(self)
@@ -235,8 +490,18 @@ class TransGui(QMainWindow):
 
         self.clipboard_record = ''
         self.clipboard = QApplication.clipboard()
-        self.clipboard_timer = QTimer()
-        self.clipboard_timer.timeout.connect(self.input_clipboard)
+        self.capture_clipboard = False
+        self.shown_hashes = set()
+        self.input_hashes = set()
+        self.clipboard.dataChanged.connect(lambda: self.input_clipboard(QClipboard.Clipboard))
+        if self.cfg.clipboard_cfg.get('selection', False) and self.clipboard.supportsSelection():
+            self.clipboard.selectionChanged.connect(lambda: self.input_clipboard(QClipboard.Selection))
+        # clipboard notifications are not delivered to inactive apps on macOS
+        poll = self.cfg.clipboard_cfg.get('poll', 'auto')
+        self.clipboard_timer = None
+        if poll is True or (poll == 'auto' and sys.platform == 'darwin'):
+            self.clipboard_timer = QTimer(self)
+            self.clipboard_timer.timeout.connect(lambda: self.input_clipboard(QClipboard.Clipboard))
 
         self.menu_bar = self.menuBar()
         self.menu_options = self.menu_bar.addMenu("设置")
@@ -246,6 +511,9 @@ class TransGui(QMainWindow):
         self.choose_gg_action = QAction('谷歌（免费）', self)
         self.choose_bd_action = QAction('百度', self)
         self.choose_yd_action = QAction('有道', self)
+        self.choose_fastest_action = QAction('最快（自动选择）', self)
+        self.dump_trace_action = QAction('导出性能记录', self)
+        self.latency_label = QLabel(self)
         self.menu_fontsize = self.menu_bar.addAction('字号：13pt')
         self.menu_show_api = self.menu_bar.addAction(f'API: {self.translator.api}')
 
@@ -292,12 +560,38 @@ class TransGui(QMainWindow):
         self.font_size_changed = False
         self.init_pattern()
 
+        self.warmed_up = False
         self.show()
 
     def screenshot(self):
         pass
 
+    def paintEvent(self, a0) -> None:
+        super().paintEvent(a0)
+        if not self.warmed_up:
+            # the backend is imported and connected once the window has been drawn
+            self.warmed_up = True
+            QTimer.singleShot(0, self.warm_up)
+
+    def warm_up(self):
+        if self.translator.asynchronous:
+            self.event_loop.submit(self.translator.warm_up())
+        else:
+            self.run_in_background(self.translator.warm_up)
+
+    def run_in_background(self, func, *args):
+        task = BackgroundTask(func, *args)
+        self.background_tasks.append(task)
+        QThreadPool.globalInstance().start(task)
+
+    def load_fuzzy_index(self):
+        # oldest first, so that the most recently used entries are evicted last
+        for src, dest, text, translation in reversed(self.memory.recent(self.fuzzy.max_entries)):
+            self.fuzzy.add(text, translation, (src, dest))
+
     def init_translator(self, server: str):
+        if server == 'fastest':
+            return self.init_fastest_translator()
         read_success = False
         if server == 'google':
             read_success = True
@@ -326,7 +620,12 @@ class TransGui(QMainWindow):
                 key2 = self.cfg.config['api'][f'{server}_api']['key2'] = keys[1]
                 read_success = True
         if read_success:
-            self.translator = Translator(server)
+            if self.event_loop is None:
+                translator_cls = Translator
+            else:
+                from translators.aio import AsyncTranslator as translator_cls
+            self.replace_translator(
+                translator_cls(server, self.memory, self.cfg.network_cfg, self.dictionary, self.fuzzy))
             try:
                 self.translator.set_api_keys(key1, key2)
             except NameError:
@@ -335,11 +634,53 @@ class TransGui(QMainWindow):
             self.cfg.dump()
         return read_success
 
+    def replace_translator(self, translator):
+        # jobs still running on the old translator finish on its executors
+        if self.translator is not None:
+            self.close_translator(self.translator)
+        self.translator = translator
+
+    def close_translator(self, translator, timeout=None):
+        translator.close()
+        if translator.asynchronous:
+            future = self.event_loop.submit(translator.aclose())
+            if timeout is not None:
+                try:
+                    future.result(timeout)
+                except Exception:
+                    # the pool is gone with the process anyway
+                    traceback.print_exc()
+
+    def init_fastest_translator(self):
+        # races the configured backends that have api keys, google needs none
+        backends = {}
+        for server in self.cfg.config['api'].get('fastest', DEFAULT_BACKENDS):
+            keys = self.cfg.config['api'].get(f'{server}_api', {})
+            if server == 'google':
+                backends[server] = None
+            elif 'key1' in keys and 'key2' in keys:
+                backends[server] = str(keys['key1']), str(keys['key2'])
+        if not backends:
+            return False
+        self.replace_translator(FastestTranslator(list(backends), self.memory, self.cfg.network_cfg, self.dictionary,
+                                                  self.fuzzy))
+        for server, keys in backends.items():
+            if keys is not None:
+                self.translator.set_api_keys(*keys, api=server)
+        self.cfg.config['api']['server'] = 'fastest'
+        self.cfg.dump()
+        return True
+
     def select_translator(self, server: str):
         if self.init_translator(server):
             self.menu_show_api.setText(f'API: {self.translator.api}')
             self.translate()
 
+    def set_detect_lang(self, state):
+        self.cfg.config['api']['detect_lang'] = state
+        self.cfg.dump()
+        self.translate()
+
     def undo(self):
         self.texted_input.setPlainText(self.input_buffer[self.undo_idx])
         self.undo_flag = True
@@ -356,12 +697,7 @@ class TransGui(QMainWindow):
         return btn
 
     def init_trans(self):
-        self.translate_thread.started.connect(self.translate)
-        self.delay.moveToThread(self.delay_thread)
         self.delay.released.connect(self.on_input_update)
-        self.delay_thread.started.connect(self.delay.main_thread)
-        self.delay_thread.finished.connect(self.delay_thread.quit)
-        self.delay_thread.start()
 
     def init_pattern(self):
         self.texted_input.setFont(self.cfg.font)
@@ -396,25 +732,35 @@ class TransGui(QMainWindow):
         self.cap_clb_action.triggered.connect(self.set_capture_clipboard)
         self.menu_options.addAction(self.cap_clb_action)
 
-        self.detect_lang_action.setChecked(False)
+        self.detect_lang_action.setChecked(self.cfg.config['api'].get('detect_lang', False))
+        self.detect_lang_action.triggered.connect(self.set_detect_lang)
         self.menu_options.addAction(self.detect_lang_action)
         self.menu_options.addMenu(self.menu_trans_api)
         self.menu_trans_api.addAction(self.choose_gg_action)
         self.menu_trans_api.addAction(self.choose_bd_action)
         self.menu_trans_api.addAction(self.choose_yd_action)
+        self.menu_trans_api.addAction(self.choose_fastest_action)
         self.choose_bd_action.triggered.connect(lambda: self.select_translator('baidu'))
         self.choose_gg_action.triggered.connect(lambda: self.select_translator('google'))
         self.choose_yd_action.triggered.connect(lambda: self.select_translator('youdao'))
+        self.choose_fastest_action.triggered.connect(lambda: self.select_translator('fastest'))
+        self.dump_trace_action.triggered.connect(self.dump_trace)
+        self.menu_options.addAction(self.dump_trace_action)
+        self.statusBar().addPermanentWidget(self.latency_label)
 
-        self.texted_input.textChanged.connect(lambda: self.delay.refresh())
+        self.texted_input.document().contentsChange.connect(self.on_input_edited)
         self.texted_output.setReadOnly(True)
         self.texted_output.cursorPositionChanged.connect(self.text_correspond)
 
     def refresh_input(self):
-        self.texted_input.setPlainText(
-            '\n'.join(sentence_split(self.texted_input.toPlainText()))
-        )
-        self.delay.refresh()
+        with tracer.span('sentence_split'):
+            string = '\n'.join(sentence_split(self.texted_input.toPlainText()))
+        self.texted_input.setPlainText(string)
+        self.delay.refresh(immediate=True)
+
+    def on_input_edited(self, position, removed, added):
+        # pasted or programmatically replaced text is translated right away
+        self.delay.refresh(immediate=added > self.paste_threshold)
 
     def on_copy(self):
         string = self.texted_output.toPlainText().replace('\n', '').replace(' ', '')
@@ -433,35 +779,43 @@ class TransGui(QMainWindow):
         if self.ignore_cursor_movement:
             self.ignore_cursor_movement = False
             return
-        row = self.texted_output.textCursor().blockNumber()
-        if row == self.texted_output.document().lineCount() - 1:
+        position = self.texted_output.textCursor().position()
+        if self.alignment is None or (i := self.alignment.locate(position)) is None:
             cursor_dest = self.texted_input.textCursor()
             cursor_dest.movePosition(QTextCursor.End)
             self.texted_input.setTextCursor(cursor_dest)
             return
 
-        cursor_src_beg = QTextCursor(self.texted_output.document().findBlockByLineNumber(row))
-        cursor_src_end = QTextCursor(self.texted_output.document().findBlockByLineNumber(row + 1))
         cursor_src = self.texted_output.textCursor()
-        cursor_src.setPosition(cursor_src_beg.anchor(), QTextCursor.MoveAnchor)
-        cursor_src.setPosition(cursor_src_end.anchor() - 1, QTextCursor.KeepAnchor)
+        self.select_span(cursor_src, *self.alignment.targets[i])
         self.ignore_cursor_movement = True
         self.texted_output.setTextCursor(cursor_src)
-        cursor_dest_beg = QTextCursor(self.texted_input.document().findBlockByLineNumber(row))
-        cursor_dest_end = QTextCursor(self.texted_input.document().findBlockByLineNumber(row + 1))
         cursor_dest = self.texted_input.textCursor()
-        cursor_dest.setPosition(cursor_dest_beg.anchor(), QTextCursor.MoveAnchor)
-        cursor_dest.setPosition(cursor_dest_end.anchor() - 1, QTextCursor.KeepAnchor)
+        self.select_span(cursor_dest, *self.alignment.sources[i])
         self.texted_input.setTextCursor(cursor_dest)
 
-    def set_capture_clipboard(self, state):
-        if state:
-            self.clipboard_timer.start(100)
-        else:
-            self.clipboard_timer.stop()
+    @staticmethod
+    def select_span(cursor, start, end):
+        # the input may have been edited since it was translated
+        last = cursor.document().characterCount() - 1
+        cursor.setPosition(min(start, last), QTextCursor.MoveAnchor)
+        cursor.setPosition(min(end, last), QTextCursor.KeepAnchor)
 
-    def input_clipboard(self):
-        if self._enabled and (string := self.clipboard.text()) != self.clipboard_record:
+    def set_capture_clipboard(self, state):
+        self.capture_clipboard = state
+        if self.clipboard_timer is not None:
+            if state:
+                self.clipboard_timer.start(100)
+            else:
+                self.clipboard_timer.stop()
+
+    def input_clipboard(self, mode=QClipboard.Clipboard):
+        if not self.capture_clipboard or not self._enabled:
+            return
+        # text copied or selected in our own panes
+        if self.clipboard.ownsClipboard() if mode == QClipboard.Clipboard else self.clipboard.ownsSelection():
+            return
+        if (string := self.clipboard.text(mode)) != self.clipboard_record:
             self.clipboard_record = string
             if (ss := string.strip()).startswith('$') or ss.count('\\') > 3:
                 return
@@ -469,17 +823,19 @@ class TransGui(QMainWindow):
                 return
             if ss.startswith('x-special/nautilus-clipboard'):
                 return
-            if string in self.texted_output.toPlainText() or string in self.texted_input.toPlainText():
+            if hash(ss) in self.shown_hashes:
                 return
+            self.set_input(string)
+
+    def set_input(self, string):
+        with tracer.span('sentence_split', chars=len(string)):
             sentences = sentence_split(string)
-            modified = ''.join(s + '\n' for s in sentences)
-            self.texted_input.setPlainText(modified)
+        modified = ''.join(s + '\n' for s in sentences)
+        self.prefetch(modified)
+        self.texted_input.setPlainText(modified)
 
     def on_input_update(self):
-        self.ignore_cursor_movement = True
-        self.translate_thread.quit()
-        self.translate_thread.wait()
-        self.translate_thread.start()
+        self.translate()
         if self.undo_flag:
             self.undo_flag = False
             return
@@ -488,16 +844,186 @@ class TransGui(QMainWindow):
         self.input_buffer.pop(1)
 
     def translate(self):
-        string = self.texted_input.toPlainText()
-        self.statusBar().showMessage('translating')
-        self.app.processEvents()
+        with tracer.span('gui.translate'):
+            self.generation += 1
+            self.cancel_stale_jobs()
+            string = self.texted_input.toPlainText()
+            self.input_hashes = text_hashes(string)
+            if not string or string.isspace():
+                self.show_translation('', '')
+                return
+            self.statusBar().showMessage('translating')
+            self.start_job(self.generation, string)
+
+    def prefetch(self, string):
+        # captured text starts translating before the debounce releases; the
+        # regular job then finds it cached or attaches to the same request
         if string and not string.isspace():
-            status, translation = self.translator.translate(string)
+            # only the latest capture is worth the quota, an older prefetch is dropped
+            if (job := self.prefetch_job) is not None and job in self.translate_jobs \
+                    and job.cancel(self.translate_pool):
+                self.translate_jobs.discard(job)
+            self.prefetch_job = self.start_job(PREFETCH, string)
+
+    def make_job(self, generation, string):
+        detect_lang = self.detect_lang_action.isChecked()
+        if self.translator.asynchronous:
+            return AsyncTranslateJob(generation, self.translator, string, self.event_loop, detect_lang)
+        return TranslateJob(generation, self.translator, string, detect_lang)
+
+    def start_job(self, generation, string):
+        job = self.make_job(generation, string)
+        job.signals.finished.connect(self.on_translated)
+        job.signals.partial.connect(self.on_partial)
+        self.translate_jobs.add(job)
+        job.start(self.translate_pool)
+        return job
+
+    def cancel_stale_jobs(self):
+        for job in list(self.translate_jobs):
+            if job.generation not in (self.generation, PREFETCH) and job.cancel(self.translate_pool):
+                self.translate_jobs.discard(job)
+
+    def on_partial(self, job, updates):
+        if job.generation != self.generation:
+            return
+        with tracer.span('gui.render.partial', lines=len(updates)):
+            self.render_partial(job, updates)
+
+    def render_partial(self, job, updates):
+        if self.partial_job is not job:
+            # the first report holds every line, the cached ones already translated
+            self.partial_job, self.partial_lines, self.output_spans = job, list(updates.values()), None
+        elif self.output_spans is None:
+            # the old output stays until the first reply arrives, then the pane is laid out once
+            for i, translation in updates.items():
+                self.partial_lines[i] = translation
+            self.ignore_cursor_movement = True
+            self.texted_output.setPlainText('\n'.join(self.partial_lines))
+            self.output_spans = [translation.count('\n') + 1 for translation in self.partial_lines]
         else:
-            status, translation = '', ''
-        self.texted_output.setPlainText(translation + '\n')
+            for i, translation in updates.items():
+                self.partial_lines[i] = translation
+            self.update_output_lines(updates)
+        self.alignment = Alignment(job.string.split('\n'), self.partial_lines)
+
+    def update_output_lines(self, updates):
+        # only the blocks of the updated lines are replaced, bottom up so that
+        # the block numbers of the lines above stay valid
+        document = self.texted_output.document()
+        starts = list(accumulate(self.output_spans, initial=0))
+        cursor = QTextCursor(document)
+        self.texted_output.blockSignals(True)
+        cursor.beginEditBlock()
+        for i in sorted(updates, reverse=True):
+            last = document.findBlockByNumber(starts[i] + self.output_spans[i] - 1)
+            cursor.setPosition(document.findBlockByNumber(starts[i]).position())
+            cursor.setPosition(last.position() + last.length() - 1, QTextCursor.KeepAnchor)
+            cursor.insertText(updates[i])
+            self.output_spans[i] = updates[i].count('\n') + 1
+        cursor.endEditBlock()
+        self.texted_output.blockSignals(False)
+
+    def on_translated(self, job, status, translation):
+        self.translate_jobs.discard(job)
+        if job.generation != self.generation:
+            return
+        streamed = job is self.partial_job and self.output_spans is not None
+        with tracer.span('gui.render', chars=len(translation)):
+            self.show_translation(status, translation, job.alignment, streamed)
+        elapsed = time.perf_counter() - job.started
+        tracer.add('gui.translation', job.started, elapsed, lines=job.string.count('\n') + 1, status=status)
+        self.show_latency(elapsed)
+
+    def show_latency(self, elapsed):
+        readout = f'{elapsed * 1000:.0f} ms'
+        if len(self.translator.latency):
+            readout += f' · p50 {self.translator.latency.p50 * 1000:.0f} ms'
+        hits = [f'lookup.{kind}' for kind in ('cache', 'dictionary', 'memory', 'fuzzy')]
+        if (hit_rate := tracer.hit_rate(hits, 'lookup.miss')) is not None:
+            readout += f' · 命中 {hit_rate:.0%}'
+        self.latency_label.setText(readout)
+
+    def dump_trace(self):
+        path = os.path.join(os.path.dirname(self.cfg.USER_CONFIG_PATH), time.strftime('trace-%Y%m%d-%H%M%S.json'))
+        count = tracer.export(path)
+        self.statusBar().showMessage(f'{count} trace events saved to {path}')
+
+    def show_translation(self, status, translation, alignment=None, streamed=False):
+        text = self.texted_output.toPlainText() if streamed else None
+        if text is not None and text.rstrip('\n') == translation:
+            # the pane already holds the translation, only the trailing newlines differ
+            # stepping back from the end avoids mixing code points with qt's utf-16 positions
+            cursor = QTextCursor(self.texted_output.document())
+            cursor.movePosition(QTextCursor.End)
+            cursor.movePosition(QTextCursor.Left, QTextCursor.KeepAnchor, len(text) - len(translation))
+            self.texted_output.blockSignals(True)
+            cursor.insertText('\n')
+            self.texted_output.blockSignals(False)
+        else:
+            self.ignore_cursor_movement = True
+            self.texted_output.setPlainText(translation + '\n')
+        self.partial_job, self.partial_lines, self.output_spans = None, [], None
+        self.alignment = alignment
+        self.shown_hashes = self.input_hashes | text_hashes(translation)
         self.statusBar().showMessage('ready' if not status else status)
 
+    def listen(self):
+        self.instance_server = InstanceServer(self.on_remote_message, self)
+        if self.instance_server.listen(ipc.socket_path()):
+            return True
+        self.statusBar().showMessage(f'single instance: {self.instance_server.error_string()}')
+        return False
+
+    def on_remote_message(self, message, reply):
+        op, text = message.get('op'), message.get('text') or ''
+        if op == 'ping':
+            reply({'status': ''})
+        elif op == 'show':
+            self.activate(text)
+            reply({'status': ''})
+        elif op == 'translate':
+            if message.get('show'):
+                self.activate(text)
+            self.remote_translate(text, reply)
+        else:
+            reply({'status': f'unknown op {op!r}'})
+
+    def activate(self, text=''):
+        if text.strip():
+            self.set_input(text)
+        self.showNormal()
+        self.raise_()
+        self.activateWindow()
+
+    def remote_translate(self, text, reply):
+        string = '\n'.join(sentence_split(text))
+        if not string.strip():
+            reply({'status': '', 'translation': ''})
+            return
+
+        def on_finished(job, status, translation):
+            self.translate_jobs.discard(job)
+            reply({'status': status, 'translation': translation})
+
+        # shares the caches and in-flight requests but never touches the panes
+        job = self.make_job(PREFETCH, string)
+        job.signals.finished.connect(on_finished)
+        self.translate_jobs.add(job)
+        job.start(self.translate_pool)
+
+    def closeEvent(self, a0) -> None:
+        if self.instance_server is not None:
+            self.instance_server.close()
+        # the event loop has to close the async clients before it stops
+        self.close_translator(self.translator, timeout=2.)
+        self.memory.close()
+        if self.dictionary is not None:
+            self.dictionary.close()
+        if self.event_loop is not None:
+            self.event_loop.stop()
+        super().closeEvent(a0)
+
     def resizeEvent(self, a0) -> None:
         super().resizeEvent(a0)
         self.x, self.y = a0.size().width(), a0.size().height()
@@ -511,41 +1037,254 @@ class TransGui(QMainWindow):
         self.texted_output.resize(box_w, box_h)
 
 
+def image_key(image: QImage):
+    # same size and same pixels; a capture shifted by a pixel may hold different text
+    # so near matches are not reused
+    image = image.convertToFormat(QImage.Format_RGB32)
+    pixels = image.constBits()
+    pixels.setsize(image.byteCount())
+    return image.width(), image.height(), hashlib.blake2b(pixels.asstring(), digest_size=16).digest()
+
+
+def image_to_array(image: QImage):
+    import numpy as np  # installed with easyocr
+
+    image = image.convertToFormat(QImage.Format_RGB888)
+    bits = image.constBits()
+    bits.setsize(image.bytesPerLine() * image.height())
+    rows = np.frombuffer(bits, np.uint8).reshape(image.height(), image.bytesPerLine())
+    return rows[:, :image.width() * 3].reshape(image.height(), image.width(), 3).copy()
+
+
+class OcrCache:
+    # recognised text of recent captures, keyed by their exact content
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.entries = OrderedDict()  # (width, height, digest) -> text
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        return None
+
+    def put(self, key, text):
+        self.entries[key] = text
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+class OcrEngine:
+    # the model is loaded once in the background, recognition waits for it
+    def __init__(self, languages=('en',)):
+        self.languages = list(languages)
+        self.reader = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        with self.lock:
+            if self.reader is None:
+                with tracer.span('ocr.load'):
+                    import easyocr
+                    self.reader = easyocr.Reader(self.languages)
+            return self.reader
+
+    def readtext(self, image: QImage):
+        reader = self.load()
+        with tracer.span('ocr.readtext', pixels=image.width() * image.height()):
+            return ' '.join(text for loc, text, prob in reader.readtext(image_to_array(image)))
+
+
+class OcrSignals(QObject):
+    finished = pyqtSignal(object, str, str)
+
+
+class OcrJob(QRunnable):
+    def __init__(self, engine: OcrEngine, image: QImage, key):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.engine = engine
+        self.image = image
+        self.key = key
+        self.signals = OcrSignals()
+
+    def run(self):
+        status, text = '', ''
+        try:
+            text = self.engine.readtext(self.image)
+        except Exception as error:
+            # shown in the status bar rather than lost with the worker thread
+            status = f'ocr error: {error}'
+        self.signals.finished.emit(self, status, text)
+
+
+class RegionSelector(QWidget):
+    # a frozen shot of the screen to drag the capture area on
+    selected = pyqtSignal(QImage)
+    cancelled = pyqtSignal()
+
+    def __init__(self, screen):
+        super().__init__(None, Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.shot = screen.grabWindow(0)
+        self.origin = self.end = None
+        self.setCursor(Qt.CrossCursor)
+        self.setGeometry(screen.geometry())
+
+    def area(self):
+        return QRect(self.origin, self.end).normalized()
+
+    def to_pixels(self, rect):
+        # the shot has device pixels, the widget logical ones
+        ratio = self.shot.width() / max(1, self.width())
+        return QRect(round(rect.x() * ratio), round(rect.y() * ratio),
+                     round(rect.width() * ratio), round(rect.height() * ratio))
+
+    def paintEvent(self, a0) -> None:
+        painter = QPainter(self)
+        painter.drawPixmap(self.rect(), self.shot)
+        painter.fillRect(self.rect(), QColor(0, 0, 0, 100))
+        if self.origin is not None:
+            area = self.area()
+            painter.drawPixmap(area, self.shot, self.to_pixels(area))
+            painter.setPen(QColor(64, 160, 255))
+            painter.drawRect(area)
+
+    def mousePressEvent(self, a0) -> None:
+        self.origin = self.end = a0.pos()
+        self.update()
+
+    def mouseMoveEvent(self, a0) -> None:
+        if self.origin is not None:
+            self.end = a0.pos()
+            self.update()
+
+    def mouseReleaseEvent(self, a0) -> None:
+        if self.origin is None:
+            return
+        self.end = a0.pos()
+        area = self.area()
+        self.close()
+        if area.width() > 3 and area.height() > 3:
+            self.selected.emit(self.shot.copy(self.to_pixels(area)).toImage())
+        else:
+            self.cancelled.emit()
+
+    def keyPressEvent(self, a0) -> None:
+        if a0.key() == Qt.Key_Escape:
+            self.close()
+            self.cancelled.emit()
+
+
 class TransGuiWithOcr(TransGui):
-    def __init__(self, app: QApplication, cfg=TransConfig()):
+    def __init__(self, app: QApplication, cfg: TransConfig = None):
         super(TransGuiWithOcr, self).__init__(app, cfg)
         self.screenshot_btn.setVisible(True)
-        self.ocr_reader = None
+        self.ocr_engine = OcrEngine(self.cfg.ocr_cfg.get('languages', ['en']))
+        self.ocr_cache = OcrCache(self.cfg.ocr_cfg.get('cache_size', 64))
+        # one recognition at a time, the model is not shared between threads
+        self.ocr_pool = QThreadPool(self)
+        self.ocr_pool.setMaxThreadCount(1)
+        self.ocr_jobs = set()
+        self.region_selector = None
+        self.clipboard_image_key = None
+
+    def warm_up(self):
+        super().warm_up()
+        task = BackgroundTask(self.ocr_engine.load)
+        self.background_tasks.append(task)
+        self.ocr_pool.start(task)
 
     def screenshot(self):
-        image_file = '._tmp.png'
-        os.system(f'gnome-screenshot -c -a -f {image_file}')
-        if image_file in os.listdir():
-            if self.ocr_reader is None:
-                self.statusBar().showMessage('loading model')
-                self.app.processEvents()
-                self.ocr_reader = easyocr.Reader(['en'])
-            self.statusBar().showMessage('recognising')
-            self.app.processEvents()
-            result = self.ocr_reader.readtext(image_file)
-            os.remove(image_file)
-            if result:
-                text = ' '.join(text for loc, text, prob in result)
-                sentences = sentence_split(text)
-                modified = ''.join(s + '\n' for s in sentences)
-                self.texted_input.setPlainText(modified)
+        if self.region_selector is not None:
+            return
+        screen = QApplication.screenAt(QCursor.pos()) or QApplication.primaryScreen()
+        self.region_selector = RegionSelector(screen)
+        self.region_selector.selected.connect(self.recognise)
+        self.region_selector.cancelled.connect(self.on_shot_cancelled)
+        self.region_selector.show()
+        self.region_selector.activateWindow()
+
+    def on_shot_cancelled(self):
+        self.region_selector = None
+        self.statusBar().showMessage('shot cancelled')
+
+    def input_clipboard(self, mode=QClipboard.Clipboard):
+        # screenshots copied by other tools are recognised as well; apps that offer
+        # an image alongside copied text (office suites, browsers) keep the text
+        if mode == QClipboard.Clipboard and self.capture_clipboard and self._enabled \
+                and (data := self.clipboard.mimeData(mode)) is not None and data.hasImage() and not data.hasText():
+            image = self.clipboard.image(mode)
+            key = image_key(image)
+            if key != self.clipboard_image_key:
+                self.clipboard_image_key = key
+                self.recognise(image, key)
+            return
+        super().input_clipboard(mode)
+
+    def recognise(self, image: QImage, key=None):
+        self.region_selector = None
+        if image.isNull():
+            return
+        if key is None:
+            key = image_key(image)
+        if (text := self.ocr_cache.get(key)) is not None:
+            tracer.count('ocr.cache')
+            self.show_recognised(text)
+            return
+        tracer.count('ocr.miss')
+        self.statusBar().showMessage('loading model' if self.ocr_engine.reader is None else 'recognising')
+        job = OcrJob(self.ocr_engine, image, key)
+        job.signals.finished.connect(self.on_recognised)
+        self.ocr_jobs.add(job)
+        self.ocr_pool.start(job)
+
+    def on_recognised(self, job, status, text):
+        self.ocr_jobs.discard(job)
+        if status:
+            self.statusBar().showMessage(status)
+            return
+        self.ocr_cache.put(job.key, text)
+        self.show_recognised(text)
+
+    def show_recognised(self, text):
+        if text:
+            self.set_input(text)
         else:
-            self.statusBar().showMessage('shot cancelled')
+            self.statusBar().showMessage('no text recognised')
 
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description='pyqt-based translator gui')
+    parser.add_argument('text', nargs='*', help='text to show and translate')
+    parser.add_argument('--new-instance', action='store_true', help='start even if an instance is running')
+    args, qt_args = parser.parse_known_args()
+    if not args.new_instance:
+        try:
+            # a running instance takes over, this launch only hands the text to it
+            ipc.request({'op': 'show', 'text': ' '.join(args.text)}, timeout=2.)
+            sys.exit(0)
+        except OSError:
+            # a busy instance has the text already, it just did not answer in time
+            if ipc.is_running():
+                sys.exit(0)
+
+    app = QApplication(sys.argv[:1] + qt_args)
     os.chdir(os.path.dirname(__file__))
     use_ocr = False
     if use_ocr:
-        import easyocr
-
         w = TransGuiWithOcr(app)
     else:
         w = TransGui(app)
+    if not args.new_instance and not w.listen() and ipc.is_running():
+        # launched at the same time as another instance, which won the socket
+        try:
+            ipc.request({'op': 'show', 'text': ' '.join(args.text)}, timeout=2.)
+        except OSError:
+            pass
+        w.close()
+        sys.exit(0)
+    if args.text:
+        w.set_input(' '.join(args.text))
     sys.exit(app.exec_())
@@ -0,0 +1,20 @@
+from translators.align import Alignment, line_spans, utf16_len
+
+# the emoji is outside the bmp, qt counts it as two positions
+SOURCES = ['Robots 🤖 move.', 'They plan ahead.', 'Done.']
+TRANSLATIONS = ['机器人 🤖 移动。', '它们提前规划。', '完成。']
+
+
+def test_spans_are_in_utf16_units():
+    assert utf16_len('🤖') == 2
+    assert line_spans(SOURCES) == [(0, 15), (16, 32), (33, 38)]
+
+
+def test_locate_lines_after_a_non_bmp_character():
+    alignment = Alignment(SOURCES, TRANSLATIONS)
+    first_end = alignment.targets[0][1]
+    assert first_end == len('机器人 🤖 移动。') + 1
+    assert alignment.locate(first_end) == 0
+    assert alignment.locate(first_end + 1) == 1
+    assert alignment.locate(alignment.targets[2][0]) == 2
+    assert alignment.locate(alignment.targets[2][1] + 1) is None
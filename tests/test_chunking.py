@@ -0,0 +1,62 @@
+import threading
+
+from translators import Translator
+from translators.chunker import get_limits, join_pieces, pack_sentences, split_sentence
+
+
+def make_translator(max_lines=1):
+    network = {'chunking': {'baidu': {'max_lines': max_lines, 'workers': 1}}}
+    return Translator('baidu', network=network)
+
+
+def test_cancelled_job_drops_its_queued_chunks():
+    translator = make_translator()
+    sent = []
+    cancelled = threading.Event()
+
+    def translate_chunk(chunk, src, dest):
+        sent.append(chunk)
+        # the job is superseded while its first chunk is in flight
+        cancelled.set()
+        return ''
+
+    translator.translate_chunk = translate_chunk
+    sentences = [f'Sentence number {i}.' for i in range(8)]
+    try:
+        status, _ = translator.translate_sentences(sentences, cancelled=cancelled.is_set)
+    finally:
+        translator.close()
+    assert status == 'cancelled'
+    assert len(sent) < len(sentences)
+
+
+def test_long_chinese_sentence_is_cut_at_clause_marks():
+    limits = get_limits('baidu')
+    sentence = '，'.join(['机器人控制器在零空间中执行次要任务'] * 400) + '。'
+    pieces = split_sentence(sentence, limits)
+    assert len(pieces) > 1 and ''.join(pieces) == sentence
+    assert all(len(p.encode('utf-8')) + 1 <= limits.max_bytes for p in pieces)
+    assert all(p.endswith(('，', '。')) for p in pieces)
+
+
+def test_chunks_respect_the_byte_budget():
+    limits = get_limits('baidu')
+    sentences = ['零空间任务的第一句。' * 20] * 40
+    for chunk in pack_sentences(sentences, limits):
+        assert len('\n'.join(chunk).encode('utf-8')) <= limits.max_bytes
+
+
+def test_oversized_sentence_is_sent_in_pieces():
+    translator = make_translator(max_lines=50)
+    sent = []
+
+    def request(string, src, dest):
+        sent.append(string)
+        return '', f'<{len(sent)}>'
+
+    translator.request = request
+    sentence = 'word ' * 1000
+    status, translations = translator.translate_sentences([sentence])
+    assert status == ''
+    assert len(sent) > 1 and all(len(s) < 2000 for s in sent)
+    assert translations == [join_pieces([f'<{i + 1}>' for i in range(len(sent))], 'zh')]
@@ -0,0 +1,31 @@
+from translators import Translator
+from translators.fuzzy import SUGGESTION_MARK, FuzzyIndex
+
+SENTENCE = 'The proposed controller reduces the tracking error by 35 percent compared to the baseline.'
+
+
+def make_index():
+    index = FuzzyIndex(threshold=0.85)
+    index.add(SENTENCE, '所提出的控制器将跟踪误差比基线降低了35%。')
+    return index
+
+
+def test_copy_artifacts_match():
+    index = make_index()
+    match = index.lookup('The pro-\nposed controller reduces the tracking error by 35 percent compared to the base- line.')
+    assert match is not None and match[1] >= 0.85
+
+
+def test_negation_or_number_change_does_not_match():
+    index = make_index()
+    assert index.lookup(SENTENCE.replace('reduces', 'does not reduce')) is None
+    assert index.lookup(SENTENCE.replace('35', '53')) is None
+
+
+def test_fuzzy_hits_are_marked_as_suggestions():
+    translator = Translator('baidu', fuzzy=make_index())
+    sentence = SENTENCE.replace('baseline', 'base line')
+    sentences, pairs, missing = translator.lookup_sentences([sentence])
+    assert not missing
+    assert (('en', 'zh', sentence)) not in translator.sentence_cache
+    assert translator.collect_sentences(sentences, pairs)[0].startswith(SUGGESTION_MARK)
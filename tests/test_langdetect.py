@@ -0,0 +1,41 @@
+import pytest
+
+from translators.langdetect import CODE, detect, plan_languages
+
+PROSE = [
+    'See Eq. (3) and [12], [13]; the cost J(x) = ||Ax - b||^2 is minimized.',
+    'The controller (see Sec. 4) tracks the reference q_d with gain K = diag(k_1, ..., k_n);',
+    'We return to the previous result; it holds for all x > 0 [7].',
+    'Let f(x) = x^2 + 1 and g(x) = |x|, then f(g(x)) >= 1.',
+]
+CODE_LINES = [
+    'for (int i = 0; i < n; i++) {',
+    'if x == y: return self.cache[x]',
+    'result = np.linalg.solve(A, b);',
+    'def joint_positions(q, dq) -> np.ndarray:',
+    '#include <vector>',
+    'import numpy as np',
+]
+
+
+@pytest.mark.parametrize('text', PROSE)
+def test_prose_with_formulas_and_citations_is_english(text):
+    assert detect(text) == 'en'
+
+
+@pytest.mark.parametrize('text', CODE_LINES)
+def test_code_is_detected(text):
+    assert detect(text) == CODE
+
+
+def test_scripts():
+    assert detect('我们首先构建一个运动学全身控制器。') == 'zh'
+    assert detect('運動学的な全身制御器を定式化する。') == 'ja'
+    assert detect('우리는 먼저 제어기를 만든다.') == 'ko'
+    assert detect('1 + 2 = 3') is None
+
+
+def test_plan_passes_code_and_destination_language_through():
+    prose, code, chinese = PROSE[0], CODE_LINES[0], '我们首先构建一个运动学全身控制器。'
+    plan = plan_languages([prose, code, chinese])
+    assert plan == {prose: ('en', 'zh'), code: None, chinese: None}
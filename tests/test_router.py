@@ -0,0 +1,33 @@
+import pytest
+
+from translators.router import FastestTranslator
+
+
+def broken(string, src, dest):
+    raise ValueError('not json')
+
+
+def make_router():
+    router = FastestTranslator(['google', 'baidu'])
+    router.backends['google'].request = broken
+    router.backends['baidu'].request = lambda string, src, dest: ('', f'译：{string}')
+    return router
+
+
+def test_raising_backend_is_routed_around():
+    router = make_router()
+    try:
+        assert router.translate_sentences(['Hello there.']) == ('', ['译：Hello there.'])
+        assert router.backends['google'].latency.error_rate == 1.
+    finally:
+        router.close()
+
+
+def test_raises_when_every_backend_raises():
+    router = make_router()
+    router.backends['baidu'].request = broken
+    try:
+        with pytest.raises(ValueError):
+            router.translate_sentences(['Hello there.'])
+    finally:
+        router.close()
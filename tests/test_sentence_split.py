@@ -0,0 +1,17 @@
+import json
+import os
+
+import pytest
+
+from translators.text import sentence_split
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      'benchmarks', 'sentence_split_corpus.json')
+
+with open(CORPUS, encoding='utf-8') as f:
+    CASES = json.load(f)
+
+
+@pytest.mark.parametrize('case', CASES, ids=[repr(case['input'][:30]) for case in CASES])
+def test_golden_corpus(case):
+    assert sentence_split(case['input']) == case['output']
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from translators.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_follower_shares_the_leader_result():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'result'
+
+    leader = threading.Thread(target=lambda: results.append(flight.do('key', fetch)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(flight.do('key', fetch)))
+    follower.start()
+    # the follower has to join while the leader is still in flight
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert results == ['result', 'result']
+    assert calls == [1]
+    assert flight._calls == {}
+
+
+def test_exception_reaches_the_caller_and_the_key_is_released():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        flight.do('key', fail)
+    assert flight._calls == {}
+    assert flight.do('key', lambda: 'again') == 'again'
+
+
+def test_async_follower_shares_the_leader_result():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'result'
+
+    async def main():
+        results = await asyncio.gather(flight.do('key', fetch), flight.do('key', fetch))
+        await asyncio.sleep(0)
+        return results
+
+    assert asyncio.run(main()) == ['result', 'result']
+    assert calls == [1]
+    assert flight._calls == {}
+
+
+def test_async_exception_reaches_every_caller_and_the_key_is_released():
+    flight = AsyncSingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError('boom')
+
+    async def main():
+        results = await asyncio.gather(flight.do('key', fail), flight.do('key', fail), return_exceptions=True)
+        await asyncio.sleep(0)
+        return results
+
+    assert all(isinstance(r, ValueError) for r in asyncio.run(main()))
+    assert flight._calls == {}
+
+
+def test_async_cancelled_caller_does_not_cancel_the_call():
+    flight = AsyncSingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return 'result'
+
+    async def main():
+        first = asyncio.ensure_future(flight.do('key', fetch))
+        second = asyncio.ensure_future(flight.do('key', fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == 'result'
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('googletrans', 'httpcore', 'httpx', 'requests', 'easyocr')
+
+
+def imported_after(statement):
+    code = f'import sys; {statement}; print(" ".join(sorted(sys.modules)))'
+    out = subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    return set(out.stdout.split())
+
+
+def test_thread_engine_imports_no_backend_or_asyncio():
+    modules = imported_after('import translators, translators.router')
+    assert not modules & {*HEAVY_MODULES, 'asyncio'}
+
+
+def test_async_engine_imports_no_backend():
+    modules = imported_after('import translators.aio')
+    assert not modules & set(HEAVY_MODULES)
+
+
+def test_first_paint_within_budget():
+    pytest.importorskip('PyQt5')
+    script = os.path.join(REPO_DIR, 'benchmarks', 'bench_startup.py')
+    result = subprocess.run([sys.executable, script, '--runs', '3'], cwd=os.path.dirname(script),
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -1,55 +1,331 @@
-import httpcore
-import requests.exceptions
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from .baidu import BDTrans
-from .yd import YDTrans
-from googletrans import Translator as GTrans
+from .align import Alignment
+from .cache import SentenceCache
+from .chunker import get_limits, join_pieces, pack_sentences, split_sentence
+from .dictionary import OfflineDictionary
+from .fuzzy import SUGGESTION_MARK, FuzzyIndex
+from .langdetect import plan_languages
+from .memory import TranslationMemory
+from .scheduler import RequestScheduler, get_rate_limit
+from .singleflight import SingleFlight
+from .stats import LatencyStats
+from .text import sentence_split
+from .trace import tracer
 
 
 class Translator:
-    all_translators = {'youdao': YDTrans, 'google': GTrans, 'baidu': BDTrans}
+    # backends are imported on first use, so that only the selected one is loaded
+    all_translators = {'youdao': ('.yd', 'YDTrans'), 'google': ('.google', 'GTrans'),
+                       'baidu': ('.baidu', 'BDTrans')}
+    language_codes = {
+        'youdao': {'en': 'en', 'zh': 'zh-CHS', 'ja': 'ja', 'ko': 'ko'},
+        'google': {'en': 'en', 'zh': 'zh-cn', 'ja': 'ja', 'ko': 'ko'},
+        'baidu': {'en': 'en', 'zh': 'zh', 'ja': 'jp', 'ko': 'kor'},
+    }
+    # shared by all instances, so a request survives switching the backend back and forth
+    inflight = SingleFlight()
+    asynchronous = False
 
-    def __init__(self, api='google'):
+    def __init__(self, api='google', memory: TranslationMemory = None, network: dict = None,
+                 dictionary: OfflineDictionary = None, fuzzy: FuzzyIndex = None):
         if api not in self.all_translators:
             api = 'google'
         self.api = api
-        self.trans = self.all_translators[self.api]()
+        network = network or {}
+        self.options = self.backend_options(api, network)
+        self.limits = get_limits(api, network.get('chunking'))
+        self.scheduler = RequestScheduler(get_rate_limit(api, network.get('rate_limit')))
+        self.init_state(memory, dictionary, fuzzy)
 
-    def translate(self, string):
+    def init_state(self, memory, dictionary, fuzzy):
+        # the state every translator keeps, whatever backend the requests go to
+        self.api_keys = None
+        self._trans = None
+        self._trans_lock = threading.Lock()
+        self.executor = None
+        self.sentence_cache = SentenceCache()
+        self.suggestions = SentenceCache()
+        self.memory = memory
+        self.dictionary = dictionary
+        self.fuzzy = fuzzy
+        self.latency = LatencyStats()
+
+    def close(self):
+        # requests already submitted still finish
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    @staticmethod
+    def backend_options(api, network):
+        connect_timeout = network.get('connect_timeout', 3.05)
+        read_timeout = network.get('read_timeout', 10)
+        if api == 'google':
+            return {'timeout': read_timeout}
+        options = {'timeout': (connect_timeout, read_timeout), 'pool_size': network.get('pool_size', 4)}
+        if api == 'baidu':
+            options['https'] = network.get('baidu_https', True)
+        if (endpoint := network.get('endpoints', {}).get(api)) is not None:
+            options['endpoint'] = endpoint
+        return options
+
+    @property
+    def trans(self):
+        # the backend is created by the first request or by warm_up in the background
+        with self._trans_lock:
+            if self._trans is None:
+                module, name = self.all_translators[self.api]
+                backend = getattr(importlib.import_module(module, __name__), name)
+                self._trans = backend(**self.options)
+                if self.api_keys is not None:
+                    self._trans.set_api_keys(*self.api_keys)
+            return self._trans
+
+    def warm_up(self):
+        # imports the backend and opens a pooled connection ahead of the first request
+        with tracer.span('warm_up', api=self.api):
+            if (warm_up := getattr(self.trans, 'warm_up', None)) is not None:
+                warm_up()
+
+    def translate(self, string, src='en', dest='zh'):
+        with tracer.span('translate', api=self.api):
+            if (translation := self.look_up_word(string, src, dest)) is not None:
+                return '', translation
+            if (translation := self.recall(string, src, dest)) is not None:
+                return '', translation
+            status, translation = self.request(string, src, dest)
+            if not status:
+                self.memorize(string, translation, src, dest)
+            return status, translation
+
+    def look_up_word(self, string, src='en', dest='zh'):
+        # single words and short phrases are answered by the offline dictionary
+        if self.dictionary is None or (src, dest) != ('en', 'zh'):
+            return None
+        return self.dictionary.lookup(string)
+
+    def recall(self, string, src='en', dest='zh'):
+        if self.memory is None:
+            return None
+        return self.memory.get(self.api, src, dest, string)
+
+    def recall_similar(self, string, src='en', dest='zh'):
+        # near duplicates, e.g. the same sentence copied from a pdf and from ocr
+        if self.fuzzy is None or (match := self.fuzzy.lookup(string, (src, dest))) is None:
+            return None
+        return match[0]
+
+    def memorize(self, string, translation, src='en', dest='zh'):
+        if self.memory is not None:
+            self.memory.put(self.api, src, dest, string, translation)
+        if self.fuzzy is not None:
+            self.fuzzy.add(string, translation, (src, dest))
+
+    def request(self, string, src='en', dest='zh'):
+        # concurrent identical requests attach to the one already in flight
+        return self.inflight.do((self.api, src, dest, string), self.fetch, string, src, dest)
+
+    def fetch(self, string, src='en', dest='zh'):
         status, translation = '', ''
+        codes = self.language_codes[self.api]
+        start = time.perf_counter()
         try:
-            if self.api == 'youdao':
-                data = self.trans.translate(string, src='en', dest='zh-CHS')
-                if data['errorCode'] == '0':
-                    translation = data['translation'][0]
-                else:
-                    status = f"youdao API: unauthorized user"
-            elif self.api == 'google':
-                data = self.trans.translate(string, src='en', dest='zh-cn')
-                info = data.extra_data['all-translations']
-                if data.src == data.dest:
-                    translation = '翻译过于频繁，请等待片刻后重新尝试！'
-                elif info is None:
-                    translation = data.text
-                else:
-                    info_text = '；'.join(
-                        f"\n{pos}：{'，'.join(alts)}" for pos, alts, *_ in info
-                    )  # e.g. intermediate 形容词：中间，中级；
-                    translation = data.text + info_text + '。'
-            elif self.api == 'baidu':
-                data = self.trans.translate(string, src='en', dest='zh')
-                if 'error_msg' in data:
-                    status = f"baidu API: {data['error_msg'].lower()}"
-                else:
-                    translation = '\n'.join(s['dst'] for s in data['trans_result'])
-        except httpcore.NetworkError:
-            status = 'network error'
-        except httpcore.TimeoutException:
-            status = 'time out'
-        except requests.exceptions.ProxyError:
-            status = 'proxy error'
+            # throttled requests are retried after a backoff, the last reply is parsed
+            data = self.scheduler.call(
+                self.trans.translate, self.is_throttled, string, src=codes[src], dest=codes[dest]
+            )
+            status, translation = self.parse(data)
+        except Exception as error:
+            if (status := self.error_status(error)) is None:
+                raise
+        self.record_request(start, string, status)
         return status, translation
 
+    def error_status(self, error):
+        # the http stack is the backend's, it is imported along with it
+        if self.api == 'google':
+            import httpcore
+            errors = ((httpcore.NetworkError, 'network error'), (httpcore.TimeoutException, 'time out'))
+        else:
+            import requests.exceptions
+            errors = ((requests.exceptions.ProxyError, 'proxy error'), (requests.exceptions.Timeout, 'time out'),
+                      (requests.exceptions.ConnectionError, 'network error'))
+        return next((status for cls, status in errors if isinstance(error, cls)), None)
+
+    def record_request(self, start, string, status):
+        elapsed = time.perf_counter() - start
+        self.latency.record(elapsed, bool(status))
+        tracer.add(f'{self.api}.request', start, elapsed, chars=len(string), status=status)
+        tracer.count(f'requests.{self.api}')
+        if status:
+            tracer.count(f'errors.{self.api}')
+
+    def is_throttled(self, data):
+        if self.api == 'youdao':
+            # 411: access frequency limited, 412: long request too frequent
+            return data['errorCode'] in ('411', '412')
+        elif self.api == 'google':
+            return data.src == data.dest
+        elif self.api == 'baidu':
+            # 54003: access frequency limited, 54005: long query too frequent, 52001/52002: timeout/system error
+            return str(data.get('error_code')) in ('54003', '54005', '52001', '52002')
+        return False
+
+    def parse(self, data):
+        status, translation = '', ''
+        if self.api == 'youdao':
+            if data['errorCode'] == '0':
+                translation = data['translation'][0]
+            else:
+                status = f"youdao API: unauthorized user"
+        elif self.api == 'google':
+            info = data.extra_data['all-translations']
+            if data.src == data.dest:
+                status = '翻译过于频繁，请等待片刻后重新尝试！'
+            elif info is None:
+                translation = data.text
+            else:
+                info_text = '；'.join(
+                    f"\n{pos}：{'，'.join(alts)}" for pos, alts, *_ in info
+                )  # e.g. intermediate 形容词：中间，中级；
+                translation = data.text + info_text + '。'
+        elif self.api == 'baidu':
+            if 'error_msg' in data:
+                status = f"baidu API: {data['error_msg'].lower()}"
+            else:
+                translation = '\n'.join(s['dst'] for s in data['trans_result'])
+        return status, translation
+
+    def translate_sentences(self, sentences, detect_lang=False, on_partial=None, cancelled=None):
+        # sentences translated before are served from the cache, so after an
+        # edit only the new or changed ones are sent to the backend
+        with tracer.span('lookup', lines=len(sentences)):
+            sentences, pairs, missing = self.lookup_sentences(sentences, detect_lang)
+        self.report_partial(on_partial, sentences, pairs)
+        tasks = [(chunk, *pair) for pair, group in missing.items() for chunk in pack_sentences(group, self.limits)]
+        if len(tasks) > 1:
+            # long documents are sent as several backend-sized requests in parallel
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(self.limits.workers, thread_name_prefix=f'{self.api}-chunk')
+            futures = {self.executor.submit(self.translate_chunk, *task): task for task in tasks}
+            statuses = []
+            for future in as_completed(futures):
+                if cancelled is not None and cancelled():
+                    # a superseded job gives up its chunks still waiting for a worker,
+                    # they would delay the current job and spend quota for nothing
+                    for pending in futures:
+                        pending.cancel()
+                    return 'cancelled', self.collect_sentences(sentences, pairs)
+                statuses.append(future.result())
+                self.report_partial(on_partial, sentences, pairs, futures[future][0])
+        else:
+            statuses = []
+            for task in tasks:
+                statuses.append(self.translate_chunk(*task))
+                self.report_partial(on_partial, sentences, pairs, task[0])
+        status = next((s for s in statuses if s), '')
+        return status, self.collect_sentences(sentences, pairs)
+
+    def translate_chunk(self, sentences, src='en', dest='zh'):
+        if len(sentences) == 1 and len(pieces := split_sentence(sentences[0], self.limits)) > 1:
+            return self.translate_pieces(sentences[0], pieces, src, dest)
+        status, translation = self.request('\n'.join(sentences), src, dest)
+        if status:
+            return status
+        results = self.split_results(sentences, translation)
+        if results is None:
+            # the backend merged or split lines, fall back to one request per sentence
+            results = []
+            for sentence in sentences:
+                status, translation = self.translate(sentence, src, dest)
+                if status:
+                    break
+                results.append(translation)
+        self.store_sentences(sentences, results, src, dest)
+        return status
+
+    def translate_pieces(self, sentence, pieces, src='en', dest='zh'):
+        translations = []
+        for piece in pieces:
+            status, translation = self.request(piece, src, dest)
+            if status:
+                return status
+            translations.append(translation)
+        self.store_sentences([sentence], [join_pieces(translations, dest)], src, dest)
+        return ''
+
+    def lookup_sentences(self, sentences, detect_lang=False):
+        sentences = [s.strip() for s in sentences]
+        if detect_lang:
+            # no request is spent on text that needs no translation
+            pairs = plan_languages(sentences)
+        else:
+            pairs = dict.fromkeys(sentences, ('en', 'zh'))
+        missing = {}
+        for sentence in dict.fromkeys(sentences):
+            if not sentence or (pair := pairs[sentence]) is None:
+                continue
+            if (*pair, sentence) in self.sentence_cache:
+                tracer.count('lookup.cache')
+            elif (translation := self.look_up_word(sentence, *pair)) is not None:
+                tracer.count('lookup.dictionary')
+                self.sentence_cache.put((*pair, sentence), translation)
+            elif (translation := self.recall(sentence, *pair)) is not None:
+                tracer.count('lookup.memory')
+                self.sentence_cache.put((*pair, sentence), translation)
+            elif (*pair, sentence) in self.suggestions:
+                tracer.count('lookup.fuzzy')
+            elif (translation := self.recall_similar(sentence, *pair)) is not None:
+                # kept apart from exact translations and shown marked as a suggestion
+                tracer.count('lookup.fuzzy')
+                self.suggestions.put((*pair, sentence), translation)
+            else:
+                tracer.count('lookup.miss')
+                missing.setdefault(pair, []).append(sentence)
+        return sentences, pairs, missing
+
+    def report_partial(self, on_partial, sentences, pairs, chunk=None):
+        # on_partial receives {line index: translation}, all lines at first and
+        # then the lines of each chunk as soon as its reply arrives
+        if on_partial is None:
+            return
+        wanted = None if chunk is None else set(chunk)
+        lines = [i for i, sentence in enumerate(sentences) if wanted is None or sentence in wanted]
+        on_partial(dict(zip(lines, self.collect_sentences([sentences[i] for i in lines], pairs))))
+
+    @staticmethod
+    def split_results(sentences, translation):
+        results = [translation] if len(sentences) == 1 else translation.split('\n')
+        return results if len(results) == len(sentences) else None
+
+    def store_sentences(self, sentences, results, src='en', dest='zh'):
+        for sentence, translation in zip(sentences, results):
+            self.sentence_cache.put((src, dest, sentence), translation)
+            self.memorize(sentence, translation, src, dest)
+
+    def collect_sentences(self, sentences, pairs):
+        translations = []
+        for sentence in sentences:
+            if not sentence:
+                translations.append('')
+            elif (pair := pairs[sentence]) is None:
+                translations.append(sentence)
+            elif (translation := self.sentence_cache.get((*pair, sentence))) is not None:
+                translations.append(translation)
+            elif (suggestion := self.suggestions.get((*pair, sentence))) is not None:
+                translations.append(f'{SUGGESTION_MARK} {suggestion}')
+            else:
+                translations.append('')
+        return translations
+
     def set_api_keys(self, key1, key2):
         if self.api != 'google':
-            self.trans.set_api_keys(key1, key2)
+            with self._trans_lock:
+                self.api_keys = key1, key2
+                if self._trans is not None:
+                    self._trans.set_api_keys(key1, key2)
+        self.sentence_cache.clear()
+        self.suggestions.clear()
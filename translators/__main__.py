@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+from . import Translator, TranslationMemory, OfflineDictionary, ipc, sentence_split
+from .router import DEFAULT_BACKENDS, FastestTranslator
+from .scheduler import get_rate_limit
+
+PKG_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_DIR = os.path.join(os.path.expanduser('~'), '.config', 'trans_gui')
+
+_worker_translator = None
+
+
+def load_config(file=None):
+    if file is None:
+        file = os.path.join(CONFIG_DIR, 'config.yaml')
+        if not os.path.exists(file):
+            file = os.path.join(PKG_DIR, 'config.yaml')
+    with open(file, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f.read())
+
+
+def open_memory(config, enabled=True):
+    memory_cfg = config.get('memory', {})
+    return TranslationMemory(
+        os.path.join(CONFIG_DIR, 'memory.sqlite3'),
+        max_entries=memory_cfg.get('max_entries', 100000),
+        enabled=memory_cfg.get('enabled', True) and enabled
+    )
+
+
+def open_dictionary(config):
+    dictionary_cfg = config.get('dictionary', {})
+    path = os.path.join(CONFIG_DIR, dictionary_cfg.get('path', 'dictionary.sqlite3'))
+    if not dictionary_cfg.get('enabled', False) or not os.path.exists(path):
+        return None
+    return OfflineDictionary(path, dictionary_cfg.get('max_words', 3))
+
+
+def make_translator(api, config, memory=None):
+    dictionary = open_dictionary(config)
+    if api == 'fastest':
+        backends = config['api'].get('fastest', DEFAULT_BACKENDS)
+        backends = [b for b in backends if b == 'google' or f'{b}_api' in config['api']]
+        translator = FastestTranslator(backends, memory, config.get('network', {}), dictionary)
+        for backend in backends:
+            keys = config['api'].get(f'{backend}_api', {})
+            if 'key1' in keys and 'key2' in keys:
+                translator.set_api_keys(str(keys['key1']), str(keys['key2']), api=backend)
+        return translator
+    translator = Translator(api, memory, config.get('network', {}), dictionary)
+    keys = config['api'].get(f'{api}_api', {})
+    if 'key1' in keys and 'key2' in keys:
+        translator.set_api_keys(str(keys['key1']), str(keys['key2']))
+    return translator
+
+
+def _init_worker(api, config):
+    global _worker_translator
+    _worker_translator = make_translator(api, config)
+
+
+def _translate_sentences(sentences):
+    return _worker_translator.translate_sentences(sentences)
+
+
+def read_records(paths, fmt, field):
+    for path in paths:
+        f = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+        with f:
+            if fmt == 'jsonl' or fmt == 'auto' and path.endswith('.jsonl'):
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        # a record without the field is passed on as None, not translated
+                        yield record, record.get(field)
+            else:
+                # paragraphs are separated by blank lines
+                paragraph = []
+                for line in f:
+                    if line.strip():
+                        paragraph.append(line)
+                    elif paragraph:
+                        yield None, ''.join(paragraph)
+                        paragraph = []
+                if paragraph:
+                    yield None, ''.join(paragraph)
+
+
+def count_done(path):
+    if not os.path.exists(path):
+        return 0
+    with open(path, 'rb+') as f:
+        data = f.read()
+        # drop a record that was cut off by an interruption
+        end = data.rfind(b'\n') + 1
+        f.truncate(end)
+    return data[:end].count(b'\n')
+
+
+class Progress:
+    def __init__(self, interval=5.):
+        self.interval = interval
+        self.start = self.last_report = time.perf_counter()
+        self.records = self.sentences = self.chars = self.cached = 0
+
+    def update(self, sentences, cached):
+        self.records += 1
+        self.sentences += len(sentences)
+        self.chars += sum(map(len, sentences))
+        self.cached += cached
+        if (now := time.perf_counter()) - self.last_report > self.interval:
+            self.last_report = now
+            self.report()
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        print(f'{self.records} records, {self.sentences} sentences ({self.cached} cached) in {elapsed:.1f}s: '
+              f'{self.records / elapsed:.2f} records/s, {self.sentences / elapsed:.2f} sentences/s, '
+              f'{self.chars / elapsed:.0f} chars/s', file=sys.stderr)
+
+
+def batch(args):
+    config = load_config(args.config)
+    api = args.api or config['api']['server']
+    memory = open_memory(config, not args.no_memory)
+
+    skip = count_done(args.output) if args.resume and args.output != '-' else 0
+    if args.output == '-':
+        out = sys.stdout
+    else:
+        out = open(args.output, 'a' if skip else 'w', encoding='utf-8')
+    progress = Progress()
+    pending = deque()
+
+    def write(index, record, text, sentences, translations, status):
+        result = dict(record) if record is not None else {'text': text}
+        result['index'] = index
+        result['translation'] = '\n'.join(translations)
+        if status:
+            result['status'] = status
+        out.write(json.dumps(result, ensure_ascii=False) + '\n')
+        out.flush()
+
+    def drain(limit):
+        # results are written in input order as soon as the oldest one is done
+        while len(pending) > limit:
+            index, record, text, sentences, translations, missing, future, status = pending.popleft()
+            if future is not None:
+                status, results = future.result()
+                for sentence, translation in zip(missing, results):
+                    if translation:
+                        translations[sentence] = translation
+                        memory.put(api, 'en', 'zh', sentence, translation)
+            write(index, record, text, sentences, [translations.get(s, '') for s in sentences], status)
+            progress.update(sentences, len(sentences) - len(missing))
+
+    # every worker process has its own token bucket, they share the backend's rate
+    network = config.setdefault('network', {})
+    rate_limits = network.setdefault('rate_limit', {})
+    for backend in config['api'].get('fastest', DEFAULT_BACKENDS) if api == 'fastest' else [api]:
+        rate_limit = get_rate_limit(backend, rate_limits)
+        rate_limits[backend] = {'rate': rate_limit.rate / args.workers,
+                                'burst': max(1, rate_limit.burst // args.workers)}
+
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(api, config)) as pool:
+        try:
+            for index, (record, text) in enumerate(read_records(args.inputs, args.format, args.field)):
+                if index < skip:
+                    continue
+                if text is None:
+                    # still written, so that the output lines up with the input for --resume
+                    print(f'record {index}: no {args.field!r} field, written without a translation', file=sys.stderr)
+                    pending.append((index, record, '', [], {}, [], None, f'no {args.field!r} field'))
+                    drain(2 * args.workers)
+                    continue
+                sentences = [s for s in sentence_split(text) if s]
+                translations, missing = {}, []
+                for sentence in dict.fromkeys(sentences):
+                    if (translation := memory.get(api, 'en', 'zh', sentence)) is not None:
+                        translations[sentence] = translation
+                    else:
+                        missing.append(sentence)
+                future = pool.submit(_translate_sentences, missing) if missing else None
+                pending.append((index, record, text, sentences, translations, missing, future, ''))
+                drain(2 * args.workers)
+            drain(0)
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            print('interrupted, rerun with --resume to continue', file=sys.stderr)
+        finally:
+            progress.report()
+            memory.close()
+            if out is not sys.stdout:
+                out.close()
+
+
+def trans(args):
+    text = ' '.join(args.text) if args.text else sys.stdin.read()
+    try:
+        # the running gui answers from its warm caches and connections
+        reply = ipc.request({'op': 'translate', 'text': text, 'show': args.show}, args.timeout)
+    except OSError:
+        if args.no_fallback:
+            print('no running instance', file=sys.stderr)
+            return 1
+        reply = translate_directly(text, args.config)
+    if reply.get('status'):
+        print(reply['status'], file=sys.stderr)
+    print(reply.get('translation', ''))
+    return 1 if reply.get('status') else 0
+
+
+def translate_directly(text, config_file=None):
+    config = load_config(config_file)
+    memory = open_memory(config)
+    try:
+        translator = make_translator(config['api']['server'], config, memory)
+        status, translations = translator.translate_sentences(sentence_split(text))
+    finally:
+        memory.close()
+    return {'status': status, 'translation': '\n'.join(translations)}
+
+
+def dict_import(args):
+    path = args.output or os.path.join(CONFIG_DIR, load_config(args.config).get('dictionary', {}).get(
+        'path', 'dictionary.sqlite3'))
+    start = time.perf_counter()
+    count = OfflineDictionary.build(args.source, path)
+    print(f'{count} entries written to {path} in {time.perf_counter() - start:.1f}s', file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m translators')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    batch_parser = commands.add_parser('batch', help='translate text files or jsonl records without the gui')
+    batch_parser.add_argument('inputs', nargs='+', help="text or jsonl files, '-' for stdin")
+    batch_parser.add_argument('-o', '--output', default='-', help='jsonl file receiving the results')
+    batch_parser.add_argument('--api', choices=sorted(Translator.all_translators) + ['fastest'], help='defaults to the configured server')
+    batch_parser.add_argument('--format', choices=('auto', 'text', 'jsonl'), default='auto')
+    batch_parser.add_argument('--field', default='text', help='field of jsonl records to translate')
+    batch_parser.add_argument('-j', '--workers', type=int, default=4, help='number of backend worker processes')
+    batch_parser.add_argument('--config', help='config.yaml to read api keys and settings from')
+    batch_parser.add_argument('--no-memory', action='store_true', help='bypass the translation memory')
+    batch_parser.add_argument('--resume', action='store_true', help='skip records already in the output file')
+    batch_parser.set_defaults(func=batch)
+
+    dict_parser = commands.add_parser('dict-import', help='build the offline dictionary from a word list')
+    dict_parser.add_argument('source', help='ecdict csv, or lines of "word<TAB>pos. meaning, meaning"')
+    dict_parser.add_argument('-o', '--output', help='defaults to the configured dictionary path')
+    dict_parser.add_argument('--config', help='config.yaml to read the dictionary path from')
+    dict_parser.set_defaults(func=dict_import)
+
+    trans_parser = commands.add_parser('trans', help='translate through the running gui instance')
+    trans_parser.add_argument('text', nargs='*', help='text to translate, read from stdin when omitted')
+    trans_parser.add_argument('--show', action='store_true', help='also show the text in the gui window')
+    trans_parser.add_argument('--timeout', type=float, default=15.)
+    trans_parser.add_argument('--no-fallback', action='store_true',
+                              help='fail instead of translating in this process when no gui is running')
+    trans_parser.add_argument('--config', help='config.yaml used when translating without the gui')
+    trans_parser.set_defaults(func=trans)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
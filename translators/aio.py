@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+
+from . import Translator
+from .chunker import join_pieces, pack_sentences, split_sentence
+from .singleflight import AsyncSingleFlight
+from .trace import tracer
+
+
+class EventLoopThread:
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='trans-event-loop', daemon=True)
+        self.thread.start()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+class AsyncTranslator(Translator):
+    # the adapters pull in httpx and the blocking backends, so they are imported on first use too
+    all_translators = {'youdao': ('.aio_backends', 'AsyncYDTrans'), 'google': ('.aio_backends', 'AsyncGTrans'),
+                       'baidu': ('.aio_backends', 'AsyncBDTrans')}
+    inflight = AsyncSingleFlight()
+    asynchronous = True
+
+    async def warm_up(self):
+        with tracer.span('warm_up', api=self.api):
+            if (warm_up := getattr(self.trans, 'warm_up', None)) is not None:
+                await warm_up()
+
+    async def aclose(self):
+        # the httpx clients of baidu and youdao keep a connection pool open
+        if (session := getattr(self._trans, 'session', None)) is not None:
+            await session.aclose()
+
+    async def translate(self, string, src='en', dest='zh'):
+        with tracer.span('translate', api=self.api):
+            if (translation := self.look_up_word(string, src, dest)) is not None:
+                return '', translation
+            if (translation := self.recall(string, src, dest)) is not None:
+                return '', translation
+            status, translation = await self.request(string, src, dest)
+            if not status:
+                self.memorize(string, translation, src, dest)
+            return status, translation
+
+    async def request(self, string, src='en', dest='zh'):
+        return await self.inflight.do((self.api, src, dest, string), self.fetch, string, src, dest)
+
+    async def fetch(self, string, src='en', dest='zh'):
+        status, translation = '', ''
+        codes = self.language_codes[self.api]
+        start = time.perf_counter()
+        try:
+            data = await self.scheduler.call_async(
+                self.trans.translate, self.is_throttled, string, src=codes[src], dest=codes[dest]
+            )
+            status, translation = self.parse(data)
+        except Exception as error:
+            if (status := self.error_status(error)) is None:
+                raise
+        self.record_request(start, string, status)
+        return status, translation
+
+    def error_status(self, error):
+        # httpx < 0.14, as pinned by googletrans, raises httpcore's exceptions and
+        # lacks some of the names of later versions, so they are looked up by name
+        import httpcore
+        import httpx
+        timeouts = tuple(cls for cls in (getattr(httpx, 'TimeoutException', None), httpcore.TimeoutException) if cls)
+        if isinstance(error, timeouts):
+            return 'time out'
+        if isinstance(error, (httpx.HTTPError, httpcore.NetworkError)):
+            return 'network error'
+        return super().error_status(error)
+
+    async def translate_sentences(self, sentences, detect_lang=False, on_partial=None):
+        with tracer.span('lookup', lines=len(sentences)):
+            sentences, pairs, missing = self.lookup_sentences(sentences, detect_lang)
+        self.report_partial(on_partial, sentences, pairs)
+        # chunks share the connection pool, at most limits.workers of them are in flight
+        semaphore = asyncio.Semaphore(self.limits.workers)
+
+        async def translate_chunk(chunk, src, dest):
+            async with semaphore:
+                status = await self.translate_chunk(chunk, src, dest)
+            self.report_partial(on_partial, sentences, pairs, chunk)
+            return status
+
+        tasks = [(chunk, *pair) for pair, group in missing.items() for chunk in pack_sentences(group, self.limits)]
+        statuses = await asyncio.gather(*(translate_chunk(*task) for task in tasks))
+        status = next((s for s in statuses if s), '')
+        return status, self.collect_sentences(sentences, pairs)
+
+    async def translate_chunk(self, sentences, src='en', dest='zh'):
+        if len(sentences) == 1 and len(pieces := split_sentence(sentences[0], self.limits)) > 1:
+            return await self.translate_pieces(sentences[0], pieces, src, dest)
+        status, translation = await self.request('\n'.join(sentences), src, dest)
+        if status:
+            return status
+        results = self.split_results(sentences, translation)
+        if results is None:
+            replies = await asyncio.gather(*(self.translate(s, src, dest) for s in sentences))
+            if status := next((s for s, _ in replies if s), ''):
+                return status
+            results = [t for _, t in replies]
+        self.store_sentences(sentences, results, src, dest)
+        return ''
+
+    async def translate_pieces(self, sentence, pieces, src='en', dest='zh'):
+        replies = await asyncio.gather(*(self.request(piece, src, dest) for piece in pieces))
+        if status := next((s for s, _ in replies if s), ''):
+            return status
+        self.store_sentences([sentence], [join_pieces([t for _, t in replies], dest)], src, dest)
+        return ''
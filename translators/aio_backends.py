@@ -0,0 +1,73 @@
+import asyncio
+import functools
+
+import httpx
+
+from .baidu import BDTrans
+from .google import GTrans
+from .trace import tracer
+from .yd import YDTrans
+
+
+def async_client(timeout, pool_size):
+    connect_timeout, read_timeout = timeout
+    if hasattr(httpx, 'Limits'):
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+    # httpx < 0.14, as pinned by googletrans
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(read_timeout, connect_timeout=connect_timeout),
+        pool_limits=httpx.PoolLimits(soft_limit=pool_size, hard_limit=pool_size)
+    )
+
+
+class AsyncBDTrans(BDTrans):
+    def make_session(self, pool_size):
+        return async_client(self.timeout, pool_size)
+
+    async def warm_up(self):
+        # best effort, a failure here shows up again on the first request
+        try:
+            await self.session.head(self.endpoint)
+        except Exception:
+            pass
+
+    async def translate(self, query, src='en', dest='zh'):
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        with tracer.span('baidu.http'):
+            r = await self.session.post(self.url, params=self.make_payload(query, src, dest), headers=headers)
+        with tracer.span('baidu.json', bytes=len(r.content)):
+            return r.json()
+
+
+class AsyncYDTrans(YDTrans):
+    def make_session(self, pool_size):
+        return async_client(self.timeout, pool_size)
+
+    async def warm_up(self):
+        try:
+            await self.session.head(self.endpoint)
+        except Exception:
+            pass
+
+    async def translate(self, q, src='en', dest='zh-CHS'):
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        with tracer.span('youdao.http'):
+            r = await self.session.post(self.url, data=self.make_data(q, src, dest), headers=headers)
+        with tracer.span('youdao.json', bytes=len(r.content)):
+            return r.json()
+
+
+class AsyncGTrans:
+    # googletrans only offers a blocking client, it is run on the loop's default executor
+    def __init__(self, timeout=None):
+        self.trans = GTrans(timeout=timeout)
+
+    async def warm_up(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.trans.warm_up)
+
+    async def translate(self, text, src='en', dest='zh-cn'):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.trans.translate, text, src=src, dest=dest))
@@ -0,0 +1,33 @@
+from bisect import bisect_right
+
+
+def utf16_len(text):
+    # qt counts positions in utf-16 units, characters outside the bmp take two
+    return len(text.encode('utf-16-le')) // 2
+
+
+def line_spans(lines):
+    spans, start = [], 0
+    for line in lines:
+        end = start + utf16_len(line)
+        spans.append((start, end))
+        start = end + 1
+    return spans
+
+
+class Alignment:
+    # character spans of each input line and of its translation in the output,
+    # so that wrapped lines and multi-line translations map back correctly
+    def __init__(self, sources, translations):
+        self.sources = line_spans(sources)
+        self.targets = line_spans(translations)
+        self._starts = [start for start, _ in self.targets]
+
+    def locate(self, position):
+        i = bisect_right(self._starts, position) - 1
+        if i < 0 or position > self.targets[i][1]:
+            return None
+        return i
+
+    def __len__(self):
+        return len(self.targets)
@@ -8,21 +8,39 @@
 import requests
 import random
 from hashlib import md5
+from requests.adapters import HTTPAdapter
+
+from .trace import tracer
 
 
 class BDTrans:
     # Set your own appid/appkey.
 
-    def __init__(self):
+    def __init__(self, timeout=(3.05, 10), pool_size=4, https=True, endpoint=None):
         self.appid = ''
         self.appkey = ''
+        self.timeout = timeout
+        self.endpoint = endpoint or ('https' if https else 'http') + '://api.fanyi.baidu.com'
+        self.url = self.endpoint + '/api/trans/vip/translate'
+        self.session = self.make_session(pool_size)
 
-    # For list of language codes, please refer to `https://api.fanyi.baidu.com/doc/21`
-    def translate(self, query, src='en', dest='zh'):
-        endpoint = 'http://api.fanyi.baidu.com'
-        path = '/api/trans/vip/translate'
-        url = endpoint + path
+    def make_session(self, pool_size):
+        # keep-alive connections are reused, so https costs one handshake per connection
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def warm_up(self):
+        # a keep-alive connection is opened before the first request needs it
+        try:
+            self.session.head(self.endpoint, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            pass
 
+    # For list of language codes, please refer to `https://api.fanyi.baidu.com/doc/21`
+    def make_payload(self, query, src='en', dest='zh'):
         # Generate salt and sign
         def make_md5(s, encoding='utf-8'):
             return md5(s.encode(encoding)).hexdigest()
@@ -30,10 +48,15 @@ class BDTrans:
         salt = random.randint(32768, 65536)
         sign = make_md5(self.appid + query + str(salt) + self.appkey)
 
+        return {'appid': self.appid, 'q': query, 'from': src, 'to': dest, 'salt': salt, 'sign': sign}
+
+    def translate(self, query, src='en', dest='zh'):
         headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-        payload = {'appid': self.appid, 'q': query, 'from': src, 'to': dest, 'salt': salt, 'sign': sign}
-        r = requests.post(url, params=payload, headers=headers)
-        return r.json()
+        payload = self.make_payload(query, src, dest)
+        with tracer.span('baidu.http'):
+            r = self.session.post(self.url, params=payload, headers=headers, timeout=self.timeout)
+        with tracer.span('baidu.json', bytes=len(r.content)):
+            return r.json()
 
     def set_api_keys(self, key1, key2):
         self.appid = key1
@@ -0,0 +1,70 @@
+from collections import namedtuple
+
+# max_bytes caps the utf-8 encoded size for providers that count bytes rather than characters
+ChunkLimits = namedtuple('ChunkLimits', ['max_chars', 'max_lines', 'workers', 'max_bytes'], defaults=(None,))
+
+# request sizes stay below the documented per-request limits, workers follow the providers' qps
+DEFAULT_LIMITS = {
+    'baidu': ChunkLimits(max_chars=2000, max_lines=50, workers=1, max_bytes=6000),
+    'youdao': ChunkLimits(max_chars=4500, max_lines=50, workers=4),
+    'google': ChunkLimits(max_chars=4500, max_lines=50, workers=2),
+}
+# where an oversized sentence is cut, best first
+CUT_MARKS = ('。！？；!?;', '，、,：:', ' \t')
+
+
+def get_limits(api, overrides=None):
+    limits = DEFAULT_LIMITS.get(api, DEFAULT_LIMITS['google'])
+    return limits._replace(**(overrides or {}).get(api, {}))
+
+
+def pack_sentences(sentences, limits: ChunkLimits):
+    chunks, chunk, size, encoded = [], [], 0, 0
+    for sentence in sentences:
+        # the joining newline counts towards the request size
+        length = len(sentence) + 1
+        length_bytes = len(sentence.encode('utf-8')) + 1
+        if chunk and (size + length > limits.max_chars or len(chunk) >= limits.max_lines
+                      or limits.max_bytes is not None and encoded + length_bytes > limits.max_bytes):
+            chunks.append(chunk)
+            chunk, size, encoded = [], 0, 0
+        chunk.append(sentence)
+        size += length
+        encoded += length_bytes
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def fitting_prefix(text, limits: ChunkLimits):
+    # length of the longest prefix that fits a request on its own
+    end = min(len(text), limits.max_chars - 1)
+    if limits.max_bytes is not None:
+        encoded = 0
+        for i, char in enumerate(text[:end]):
+            encoded += len(char.encode('utf-8'))
+            if encoded + 1 > limits.max_bytes:
+                return i
+    return end
+
+
+def split_sentence(sentence, limits: ChunkLimits):
+    # a sentence too long for one request (sentence_split never breaks chinese text)
+    # is cut at the last clause boundary that fits, or hard at the limit
+    pieces = []
+    while sentence:
+        end = fitting_prefix(sentence, limits)
+        if end < len(sentence):
+            head = sentence[:end]
+            for marks in CUT_MARKS:
+                if (cut := max(head.rfind(mark) for mark in marks)) > 0:
+                    end = cut + 1
+                    break
+        end = max(end, 1)
+        pieces.append(sentence[:end])
+        sentence = sentence[end:]
+    return pieces
+
+
+def join_pieces(translations, dest):
+    return ('' if dest in ('zh', 'ja') else ' ').join(t.strip() for t in translations)
@@ -0,0 +1,87 @@
+import csv
+import os
+import re
+import sqlite3
+import threading
+
+POS_NAMES = {
+    'n': '名词', 'v': '动词', 'vt': '及物动词', 'vi': '不及物动词', 'a': '形容词', 'adj': '形容词',
+    'ad': '副词', 'adv': '副词', 'prep': '介词', 'conj': '连词', 'pron': '代词', 'int': '感叹词',
+    'interj': '感叹词', 'num': '数词', 'art': '冠词', 'abbr': '缩写', 'aux': '助动词', 'pl': '复数',
+}
+_ENTRY = re.compile(r'^\s*([a-z]+)\.\s*(.*)$')
+_WORDS = re.compile(r"^[A-Za-z][A-Za-z'\-]*(?: [A-Za-z][A-Za-z'\-]*)*$")
+
+
+def parse_entry(translation):
+    # ecdict style: one "pos. meaning, meaning; meaning" line per part of speech
+    senses = []
+    for line in translation.replace('\\n', '\n').split('\n'):
+        if not (line := line.strip()):
+            continue
+        if match := _ENTRY.match(line):
+            pos = POS_NAMES.get(match.group(1), match.group(1))
+            line = match.group(2)
+        else:
+            pos = ''
+        alts = [alt.strip() for alt in re.split(r'[,;，；]', line) if alt.strip()]
+        if alts:
+            senses.append((pos, alts))
+    return senses
+
+
+def format_entry(senses):
+    # same layout as google's all-translations, e.g. intermediate 形容词：中间，中级；
+    text = senses[0][1][0]
+    info_text = '；'.join(f"\n{pos}：{'，'.join(alts)}" if pos else f"\n{'，'.join(alts)}" for pos, alts in senses)
+    return text + info_text + '。'
+
+
+class OfflineDictionary:
+    def __init__(self, path, max_words=3):
+        self.path = path
+        self.max_words = max_words
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+        # the word list is read through a memory map instead of read() calls
+        self._conn.execute('PRAGMA mmap_size=268435456')
+
+    def accepts(self, text):
+        return len(text) < 64 and text.count(' ') < self.max_words and _WORDS.match(text) is not None
+
+    def lookup(self, text):
+        text = text.strip().rstrip('.,;:!?')
+        if not self.accepts(text):
+            return None
+        with self._lock:
+            row = self._conn.execute('SELECT translation FROM words WHERE word=?', (text,)).fetchone()
+            if row is None and text != text.lower():
+                row = self._conn.execute('SELECT translation FROM words WHERE word=?', (text.lower(),)).fetchone()
+        if row is None or not (senses := parse_entry(row[0])):
+            return None
+        return format_entry(senses)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def build(source, path):
+        # accepts the ecdict csv (word and translation columns) or "word<TAB>translation" lines
+        if os.path.exists(path):
+            os.remove(path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE words (word TEXT PRIMARY KEY, translation TEXT) WITHOUT ROWID')
+        with open(source, 'r', encoding='utf-8', newline='') as f:
+            header = f.readline()
+            f.seek(0)
+            if 'word' in header and 'translation' in header:
+                rows = ((r['word'], r['translation']) for r in csv.DictReader(f))
+            else:
+                rows = (line.rstrip('\n').split('\t', 1) for line in f if '\t' in line)
+            conn.executemany('INSERT OR REPLACE INTO words VALUES (?, ?)', ((w.strip(), t) for w, t in rows if w and t))
+        conn.commit()
+        count = conn.execute('SELECT COUNT(*) FROM words').fetchone()[0]
+        conn.close()
+        return count
@@ -0,0 +1,133 @@
+import re
+import threading
+from array import array
+from collections import OrderedDict
+
+_EMPTY = (1 << 32) - 1
+_MASK = (1 << 64) - 1
+_FOLD = {ord('ﬀ'): 'ff', ord('ﬁ'): 'fi', ord('ﬂ'): 'fl', ord('ﬃ'): 'ffi', ord('ﬄ'): 'ffl',
+         ord('‘'): "'", ord('’'): "'", ord('“'): '"', ord('”'): '"', ord('\n'): ' '}
+_NOISE = re.compile(r"[^\w']+")
+# marks a reused translation of a near duplicate, it is a suggestion rather than a translation
+SUGGESTION_MARK = '≈'
+# a near duplicate that differs in a number or a negation means something else
+_GUARD = re.compile(r"\d+|\b(?:not|no|never|none|nor|neither|without|cannot)\b|n't\b")
+
+
+def guard_key(norm):
+    return hash(tuple(_GUARD.findall(norm)))
+
+
+def normalize(text):
+    # folds the usual pdf and ocr copy artifacts: ligatures, quote styles, hyphenation, spacing
+    text = text.translate(_FOLD).casefold().replace('- ', '')
+    return _NOISE.sub(' ', text).strip()
+
+
+class FuzzyIndex:
+    def __init__(self, max_entries=100000, threshold=0.85, ngram=3, bands=4, rows=8):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ngram = ngram
+        self.bands = bands
+        self.rows = rows
+        self.size = bands * rows
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # hash of (pair, normalized text) -> (pair, translation, signature, guard key), the text itself is not kept
+        self._entries = OrderedDict()
+        self._buckets = [{} for _ in range(bands)]
+
+    def signature(self, text):
+        # one permutation minhash: every shingle is hashed once and kept in one of the bins
+        shingles = {text[i:i + self.ngram] for i in range(len(text) - self.ngram + 1)}
+        if len(shingles) < self.rows:
+            return None
+        size = self.size
+        sig = array('I', [_EMPTY]) * size
+        for shingle in shingles:
+            h = hash(shingle) & _MASK
+            b = h % size
+            if (v := (h // size) & 0xFFFFFFFE) < sig[b]:
+                sig[b] = v
+        if _EMPTY in sig:
+            # rotation densification, empty bins borrow from the next filled one
+            for i in range(size):
+                j, offset = i, 0
+                while sig[j] == _EMPTY:
+                    j = (j + 1) % size
+                    offset += 1
+                if offset:
+                    sig[i] = (sig[j] + offset * 0x9E3779B9) & 0xFFFFFFFE
+        return sig
+
+    def _band_keys(self, pair, sig):
+        rows = self.rows
+        return [hash((pair, b, tuple(sig[b * rows:(b + 1) * rows]))) for b in range(self.bands)]
+
+    def add(self, text, translation, pair=('en', 'zh')):
+        norm = normalize(text)
+        if (sig := self.signature(norm)) is None:
+            return
+        key = hash((pair, norm))
+        with self._lock:
+            if key in self._entries:
+                self._entries[key] = (pair, translation, *self._entries[key][2:])
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = (pair, translation, sig, guard_key(norm))
+            for bucket, band_key in zip(self._buckets, self._band_keys(pair, sig)):
+                # most buckets hold a single key, lists are only made on collisions
+                if (keys := bucket.get(band_key)) is None:
+                    bucket[band_key] = key
+                elif isinstance(keys, list):
+                    keys.append(key)
+                else:
+                    bucket[band_key] = [keys, key]
+            while len(self._entries) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        key, (pair, _, sig, _) = self._entries.popitem(last=False)
+        for bucket, band_key in zip(self._buckets, self._band_keys(pair, sig)):
+            keys = bucket[band_key]
+            if not isinstance(keys, list):
+                del bucket[band_key]
+                continue
+            keys.remove(key)
+            if len(keys) == 1:
+                bucket[band_key] = keys[0]
+
+    def lookup(self, text, pair=('en', 'zh')):
+        norm = normalize(text)
+        if (sig := self.signature(norm)) is None:
+            return None
+        best, best_similarity = None, self.threshold
+        guard = guard_key(norm)
+        with self._lock:
+            if (entry := self._entries.get(hash((pair, norm)))) is not None:
+                self.hits += 1
+                return entry[1], 1.
+            candidates = set()
+            for bucket, band_key in zip(self._buckets, self._band_keys(pair, sig)):
+                if isinstance(keys := bucket.get(band_key), list):
+                    candidates.update(keys)
+                elif keys is not None:
+                    candidates.add(keys)
+            for key in candidates:
+                _, translation, other, other_guard = self._entries[key]
+                if other_guard != guard:
+                    continue
+                # the share of equal bins estimates the jaccard similarity of the shingle sets
+                similarity = sum(a == b for a, b in zip(sig, other)) / self.size
+                if similarity >= best_similarity:
+                    best, best_similarity = translation, similarity
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return best, best_similarity
+
+    def __len__(self):
+        return len(self._entries)
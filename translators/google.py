@@ -0,0 +1,16 @@
+import httpcore
+from googletrans import Translator
+
+
+class GTrans(Translator):
+    def warm_up(self):
+        # googletrans only connects on the first translation, the keep-alive
+        # connection of its client is opened here instead
+        host = (getattr(self, 'service_urls', None) or ['translate.google.com'])[0]
+        client = getattr(self, 'client', None)
+        if client is None:
+            return
+        try:
+            client.head(f'https://{host}')
+        except (httpcore.NetworkError, httpcore.TimeoutException):
+            pass
@@ -0,0 +1,49 @@
+import getpass
+import json
+import os
+import socket
+import sys
+import tempfile
+
+SERVER_NAME = 'trans_gui'
+
+
+def socket_path():
+    # one instance per user; QLocalServer listens on exactly this path or pipe
+    if sys.platform == 'win32':
+        return rf'\\.\pipe\{SERVER_NAME}-{getpass.getuser()}'
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(runtime_dir, f'{SERVER_NAME}-{os.getuid()}.sock')
+
+
+def encode(message):
+    return (json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def request(message, timeout=15.):
+    # one json object per line each way; raises OSError when no instance is running
+    if sys.platform == 'win32':
+        with open(socket_path(), 'r+b', buffering=0) as pipe:
+            pipe.write(encode(message))
+            line = pipe.readline()
+    else:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path())
+            sock.sendall(encode(message))
+            with sock.makefile('rb') as f:
+                line = f.readline()
+    if not line:
+        raise ConnectionResetError('the running instance closed the connection')
+    return json.loads(line)
+
+
+def is_running():
+    # a busy instance may not answer in time, only a dead one refuses the connection
+    try:
+        request({'op': 'ping'}, timeout=1.)
+    except socket.timeout:
+        return True
+    except OSError:
+        return False
+    return True
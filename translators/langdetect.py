@@ -0,0 +1,49 @@
+import re
+
+CODE = 'code'
+
+_HAN = re.compile(r'[㐀-䶿一-鿿豈-﫿]')
+_KANA = re.compile(r'[぀-ヿㇰ-ㇿ]')
+_HANGUL = re.compile(r'[ᄀ-ᇿ㄰-㆏가-힯]')
+_LATIN_WORD = re.compile(r'[A-Za-zÀ-ɏ]{2,}')
+# cues that ordinary prose, including papers with citations and formulas, does not have
+_CODE_CUE = re.compile(
+    r'[{}`]|==|!=|->|=>|::|\+\+|&&|#include\b|\b(?:def|elif|lambda|return|import|const|void|nullptr|printf|println)\b'
+    r'|\b(?:self|this)\.|\w+\.\w+\(|\b[A-Za-z]\w*_\w+|;\s*$'
+)
+# lines that are code on their own
+_CODE_LINE = re.compile(r'^\s*(?:#include\b|#define\b|from [\w.]+ import |import [\w.]+(?: as \w+)?\s*$)')
+
+
+def detect(text):
+    # script counts are enough to tell the languages the backends are used for apart
+    han = len(_HAN.findall(text))
+    kana = len(_KANA.findall(text))
+    hangul = len(_HANGUL.findall(text))
+    words = len(_LATIN_WORD.findall(text))
+    if hangul and hangul >= han and hangul > words:
+        return 'ko'
+    if kana and kana + han > words:
+        return 'ja'
+    # english terms are common in chinese text, so han characters have to outnumber words clearly
+    if han and han > 1.5 * words:
+        return 'zh'
+    if words:
+        if _CODE_LINE.match(text):
+            return CODE
+        cues = len(_CODE_CUE.findall(text))
+        return CODE if cues >= 2 and 2 * cues >= words else 'en'
+    return None
+
+
+def plan_languages(sentences, target='zh', fallback='en'):
+    # the document's main language picks the direction, sentences that are already in
+    # the destination language, code or have no words at all are passed through
+    languages = {s: detect(s) for s in sentences if s}
+    weights = {}
+    for sentence, language in languages.items():
+        if language not in (None, CODE):
+            weights[language] = weights.get(language, 0) + len(sentence)
+    main = max(weights, key=weights.get) if weights else None
+    dest = fallback if main == target else target
+    return {s: None if language in (None, CODE, dest) else (language, dest) for s, language in languages.items()}
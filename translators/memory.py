@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+def normalize(text):
+    return ' '.join(text.split())
+
+
+class TranslationMemory:
+    touch_batch = 64
+
+    def __init__(self, path, max_entries=100000, enabled=True):
+        self.path = path
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._conn = None
+        self._count = 0
+        if enabled:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS memory ('
+                'backend TEXT, src TEXT, dest TEXT, text TEXT, translation TEXT, last_used REAL, '
+                'PRIMARY KEY (backend, src, dest, text))'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS memory_last_used ON memory (last_used)')
+            self._conn.commit()
+            self._count = self._conn.execute('SELECT COUNT(*) FROM memory').fetchone()[0]
+
+    def get(self, backend, src, dest, text):
+        if not self.enabled:
+            return None
+        key = (backend, src, dest, normalize(text))
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT translation FROM memory WHERE backend=? AND src=? AND dest=? AND text=?', key
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # recency updates are written in batches to keep lookups off the disk
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.touch_batch:
+                self._flush()
+            return row[0]
+
+    def put(self, backend, src, dest, text, translation):
+        if not self.enabled:
+            return
+        key = (backend, src, dest, normalize(text))
+        with self._lock:
+            self._touched.pop(key, None)
+            exists = self._conn.execute(
+                'SELECT 1 FROM memory WHERE backend=? AND src=? AND dest=? AND text=?', key
+            ).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO memory VALUES (?, ?, ?, ?, ?, ?)', (*key, translation, time.time())
+            )
+            if exists is None:
+                self._count += 1
+            if self._count > self.max_entries:
+                self._flush()
+                self._conn.execute(
+                    'DELETE FROM memory WHERE rowid IN (SELECT rowid FROM memory ORDER BY last_used LIMIT ?)',
+                    (self._count - self.max_entries,)
+                )
+                self._count = self.max_entries
+            self._conn.commit()
+
+    def _flush(self):
+        if self._touched:
+            self._conn.executemany(
+                'UPDATE memory SET last_used=? WHERE backend=? AND src=? AND dest=? AND text=?',
+                [(t, *key) for key, t in self._touched.items()]
+            )
+            self._touched.clear()
+            self._conn.commit()
+
+    def recent(self, limit):
+        if not self.enabled:
+            return []
+        with self._lock:
+            return self._conn.execute(
+                'SELECT src, dest, text, translation FROM memory ORDER BY last_used DESC LIMIT ?', (limit,)
+            ).fetchall()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'entries': self._count, 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.}
+
+    def clear(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute('DELETE FROM memory')
+            self._conn.commit()
+            self._count = 0
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._flush()
+                self._conn.close()
+                self._conn = None
+            self.enabled = False
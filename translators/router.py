@@ -0,0 +1,104 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from . import Translator
+from .chunker import ChunkLimits
+from .dictionary import OfflineDictionary
+from .fuzzy import FuzzyIndex
+from .memory import TranslationMemory
+from .trace import tracer
+
+
+# raced when the config does not list any
+DEFAULT_BACKENDS = ('google', 'baidu', 'youdao')
+
+
+class FastestTranslator(Translator):
+    hedge_delay = 1.  # used until a backend has latency samples
+
+    def __init__(self, backends=DEFAULT_BACKENDS, memory: TranslationMemory = None,
+                 network: dict = None, dictionary: OfflineDictionary = None, fuzzy: FuzzyIndex = None):
+        self.api = 'fastest'
+        self.backends = {api: Translator(api, network=network) for api in backends}
+        self.options = {}
+        # chunks have to fit every backend they may be routed to
+        self.limits = ChunkLimits(
+            max_chars=min(b.limits.max_chars for b in self.backends.values()),
+            max_lines=min(b.limits.max_lines for b in self.backends.values()),
+            workers=max(b.limits.workers for b in self.backends.values()),
+            max_bytes=min((b.limits.max_bytes for b in self.backends.values() if b.limits.max_bytes), default=None)
+        )
+        self.hedge_executor = ThreadPoolExecutor(2 * len(self.backends), thread_name_prefix='fastest')
+        self.init_state(memory, dictionary, fuzzy)
+
+    def rank(self):
+        def expected_latency(api):
+            stats = self.backends[api].latency
+            # untried backends are probed first, errors make a backend look slower
+            return stats.p50 * (1 + 4 * stats.error_rate) if len(stats) else 0.
+
+        return sorted(self.backends, key=expected_latency)
+
+    def fetch(self, string, src='en', dest='zh'):
+        candidates = self.rank()
+        hedge_after = self.backends[candidates[0]].latency.percentile(0.95, self.hedge_delay)
+        pending = {}
+
+        def launch():
+            api = candidates.pop(0)
+            future = self.hedge_executor.submit(self.backends[api].request, string, src, dest)
+            pending[future] = api, time.perf_counter()
+
+        start = time.perf_counter()
+        status, translation = '', ''
+        error = None
+        launch()
+        hedged = False
+        while pending:
+            timeout = hedge_after if candidates and not hedged else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # the best backend is slower than its p95, race a duplicate on the next one
+                hedged = True
+                tracer.count('requests.hedged')
+                launch()
+                continue
+            for future in done:
+                api, launched = pending.pop(future)
+                try:
+                    status, translation = future.result()
+                except Exception as e:
+                    # a broken backend counts as a failed reply, the next one is tried
+                    self.backends[api].latency.record(time.perf_counter() - launched, True)
+                    tracer.count(f'errors.{api}')
+                    error = e
+                    continue
+                if not status:
+                    # queued losers never start, running ones finish in the background and are ignored
+                    for loser in pending:
+                        loser.cancel()
+                    self.latency.record(time.perf_counter() - start)
+                    return status, translation
+            if not pending and candidates:
+                launch()
+        self.latency.record(time.perf_counter() - start, True)
+        if not status and error is not None:
+            # no candidate replied at all
+            raise error
+        return status, translation
+
+    def warm_up(self):
+        for backend in self.backends.values():
+            backend.warm_up()
+
+    def close(self):
+        self.hedge_executor.shutdown(wait=False)
+        for backend in self.backends.values():
+            backend.close()
+        super().close()
+
+    def set_api_keys(self, key1, key2, api=None):
+        if api in self.backends:
+            self.backends[api].set_api_keys(key1, key2)
+        self.sentence_cache.clear()
+        self.suggestions.clear()
@@ -0,0 +1,83 @@
+import random
+import threading
+import time
+from collections import namedtuple
+
+RateLimit = namedtuple('RateLimit', ['rate', 'burst'])
+
+# sustained requests per second each provider accepts on its basic plan
+DEFAULT_RATES = {
+    'baidu': RateLimit(rate=1., burst=1),
+    'youdao': RateLimit(rate=5., burst=5),
+    'google': RateLimit(rate=2., burst=5),
+}
+
+
+def get_rate_limit(api, overrides=None):
+    limit = DEFAULT_RATES.get(api, DEFAULT_RATES['google'])
+    return limit._replace(**(overrides or {}).get(api, {}))
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        # takes a token and returns how long to wait for it; callers queue up
+        # behind each other because the balance may go negative
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1
+            return max(0., -self.tokens / self.rate)
+
+    def acquire(self):
+        if (delay := self.reserve()) > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        import asyncio
+        if (delay := self.reserve()) > 0:
+            await asyncio.sleep(delay)
+
+
+class RequestScheduler:
+    def __init__(self, limit: RateLimit, max_retries=4, base_delay=0.5, max_delay=8.):
+        self.bucket = TokenBucket(limit.rate, limit.burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.throttled = 0
+
+    def backoff(self, attempt):
+        # exponential backoff with full jitter
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, func, is_throttled, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            result = func(*args, **kwargs)
+            if not is_throttled(result):
+                break
+            self.throttled += 1
+            if attempt < self.max_retries:
+                time.sleep(self.backoff(attempt))
+        return result
+
+    async def call_async(self, func, is_throttled, *args, **kwargs):
+        # asyncio is imported by the async engine only, the thread engine does without it
+        import asyncio
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire_async()
+            result = await func(*args, **kwargs)
+            if not is_throttled(result):
+                break
+            self.throttled += 1
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.backoff(attempt))
+        return result
@@ -0,0 +1,37 @@
+import threading
+from collections import deque
+
+
+class LatencyStats:
+    def __init__(self, window=100):
+        self._samples = deque(maxlen=window)
+        self._errors = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, error=False):
+        with self._lock:
+            self._samples.append(seconds)
+            self._errors.append(error)
+
+    def percentile(self, q, default=0.):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return default
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+    @property
+    def p50(self):
+        return self.percentile(0.5)
+
+    @property
+    def p95(self):
+        return self.percentile(0.95)
+
+    @property
+    def error_rate(self):
+        with self._lock:
+            return sum(self._errors) / len(self._errors) if self._errors else 0.
+
+    def __len__(self):
+        return len(self._samples)
@@ -0,0 +1,35 @@
+import re
+
+_SPACES = {ord('\n'): ' ', ord('‘'): "'", ord('’'): "'"}
+# a sentence ends at . : or ; when the next non-space character starts a new one
+_BOUNDARY = re.compile(r'[.:;](?= *([^ ]))')
+
+
+class _PrintableTable(dict):
+    # str.translate table deleting unprintable characters, filled lazily per code point
+    def __missing__(self, key):
+        value = self[key] = key if chr(key).isprintable() else None
+        return value
+
+
+_PRINTABLE = _PrintableTable()
+
+
+def sentence_split(string: str):
+    modified = string.translate(_SPACES)
+    modified = modified.replace('- ', '').replace('? ', '')
+    if not modified.isprintable():
+        modified = modified.translate(_PRINTABLE)
+    if not modified:
+        return []
+    # space is the only printable whitespace left, so strip(' ') equals strip()
+    text = modified.strip(' ')
+    sentences = []
+    start = 0
+    for match in _BOUNDARY.finditer(text):
+        following = match.group(1)
+        if following.isupper() or following == '•':
+            sentences.append(text[start:match.end()])
+            start = match.start(1)
+    sentences.append(text[start:])
+    return sentences
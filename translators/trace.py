@@ -0,0 +1,80 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+
+class Tracer:
+    # spans of the hot path, kept in a ring buffer and exported in the Chrome
+    # trace event format (chrome://tracing, https://ui.perfetto.dev)
+    def __init__(self, max_events=20000):
+        self.events = deque(maxlen=max_events)
+        self.counters = Counter()
+        self.totals = {}  # span name -> (count, seconds)
+        self.enabled = True
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **args):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter() - start, **args)
+
+    def add(self, name, start, duration, **args):
+        if not self.enabled:
+            return
+        event = {'name': name, 'ph': 'X', 'ts': start * 1e6, 'dur': duration * 1e6,
+                 'pid': os.getpid(), 'tid': threading.get_ident()}
+        if args:
+            event['args'] = args
+        with self._lock:
+            self.events.append(event)
+            count, total = self.totals.get(name, (0, 0.))
+            self.totals[name] = count + 1, total + duration
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += n
+
+    def hit_rate(self, hits, misses):
+        with self._lock:
+            hit = sum(self.counters[name] for name in hits)
+            total = hit + self.counters[misses]
+        return hit / total if total else None
+
+    def summary(self):
+        with self._lock:
+            spans = {name: {'count': count, 'total_ms': total * 1e3, 'mean_ms': total / count * 1e3}
+                     for name, (count, total) in self.totals.items()}
+            return {'spans': spans, 'counters': dict(self.counters)}
+
+    def export(self, path):
+        with self._lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+        if events:
+            # the counters are written once, at the time of the last event
+            end = max(e['ts'] + e['dur'] for e in events)
+            events.append({'name': 'counters', 'ph': 'C', 'ts': end, 'pid': os.getpid(), 'args': counters})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': self.summary()},
+                      f, ensure_ascii=False)
+        return len(events)
+
+    def clear(self):
+        with self._lock:
+            self.events.clear()
+            self.counters.clear()
+            self.totals.clear()
+
+
+# one tracer for the whole process, the GUI and the engine report to it
+tracer = Tracer()
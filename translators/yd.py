@@ -1,19 +1,39 @@
 import sys
 import uuid
 import requests
+from requests.adapters import HTTPAdapter
 import hashlib
 from importlib import reload
 import json
 import time
 
+from .trace import tracer
+
 reload(sys)
 
 
 class YDTrans:
-    YOUDAO_URL = 'https://openapi.youdao.com/api'
-    def __init__(self) -> None:
+    YOUDAO_ENDPOINT = 'https://openapi.youdao.com'
+    def __init__(self, timeout=(3.05, 10), pool_size=4, endpoint=None) -> None:
         self.APP_KEY = ''
         self.APP_SECRET = ''
+        self.timeout = timeout
+        self.endpoint = endpoint or self.YOUDAO_ENDPOINT
+        self.url = self.endpoint + '/api'
+        self.session = self.make_session(pool_size)
+
+    def make_session(self, pool_size):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def warm_up(self):
+        try:
+            self.session.head(self.endpoint, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            pass
 
     def set_api_keys(self, key1, key2):
         self.APP_KEY = key1
@@ -32,17 +52,20 @@ class YDTrans:
 
     def do_request(self, data):
         headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-        return requests.post(self.YOUDAO_URL, data=data, headers=headers)
+        return self.session.post(self.url, data=data, headers=headers, timeout=self.timeout)
 
-    def translate(self, q, src='en', dest='zh-CHS'):
+    def make_data(self, q, src='en', dest='zh-CHS'):
         curtime = str(int(time.time()))
         salt = str(uuid.uuid1())
         sign_str = self.APP_KEY + self.truncate(q) + salt + curtime + self.APP_SECRET
         sign = self.encrypt(sign_str)
-        data = {'from': src, 'to': dest, 'signType': 'v3', 'curtime': curtime, 'appKey': self.APP_KEY, 'q': q,
+        return {'from': src, 'to': dest, 'signType': 'v3', 'curtime': curtime, 'appKey': self.APP_KEY, 'q': q,
                 'salt': salt, 'sign': sign, 'vocabId': "FF05510A2BE1426E86D62EFAD4D30EDD"}
 
-        response = self.do_request(data)
+    def translate(self, q, src='en', dest='zh-CHS'):
+        data = self.make_data(q, src, dest)
+        with tracer.span('youdao.http'):
+            response = self.do_request(data)
         content_type = response.headers['Content-Type']
         # if content_type == "audio/mp3":
         #     millis = int(round(time.time() * 1000))
@@ -51,7 +74,8 @@ class YDTrans:
         #     fo.write(response.content)
         #     fo.close()
         # else:
-        return json.loads(response.content)
+        with tracer.span('youdao.json', bytes=len(response.content)):
+            return json.loads(response.content)
         # trans = json.loads(response.content)['translation'][0]
         # return trans.split('\n')
 